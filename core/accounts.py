@@ -0,0 +1,120 @@
+"""The logged-in user and their profile, from one cached query.
+
+Django's ``AuthenticationMiddleware`` loads the user on every request, and
+the views then query again for the user's patient or staff profile.
+``ProfileAuthenticationMiddleware`` loads the user with both profiles joined
+in, and keeps the result in the ``HMS_USER_CACHE`` alias for
+``HMS_USER_CACHE_TTL`` seconds. A logged-in request then costs only the
+session lookup. ``core.signals`` drops the entry whenever the user or one of
+their profiles is saved or deleted. Bulk updates bypass the signals and show
+up when the entry expires.
+
+The entry is only dropped from the cache of the process that made the change.
+With the default per-process (locmem) cache and several workers, the others
+keep the old user for up to ``HMS_USER_CACHE_TTL`` seconds, so a password change
+or deactivation takes that long to end sessions there. Deployments with more
+than one worker must point ``HMS_USER_CACHE`` at a shared cache;
+``manage.py check --deploy`` warns (core.W001) when they don't.
+
+The session auth hash is checked against the cached user the same way
+``django.contrib.auth.get_user`` does it. With a shared cache, changing a
+password still ends the user's other sessions at once.
+"""
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+from .models import User
+
+PROFILES = ('patientprofile', 'staffprofile')
+CACHE_KEY = 'hms:user:{}'
+
+
+def _cache():
+    return caches[getattr(settings, 'HMS_USER_CACHE', 'default')]
+
+
+def load_user(user_id):
+    """The user with both profiles joined in, or None if there is no such user."""
+    cache = _cache()
+    key = CACHE_KEY.format(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = User.objects.select_related(*PROFILES).filter(pk=user_id).first()
+        if user is not None:
+            cache.set(key, user, getattr(settings, 'HMS_USER_CACHE_TTL', 300))
+    return user
+
+
+def invalidate(user_id):
+    _cache().delete(CACHE_KEY.format(user_id))
+
+
+def staff_profile(user):
+    """The user's StaffProfile, or None for patients, admins and anonymous users."""
+    return getattr(user, 'staffprofile', None)
+
+
+def _session_verified(request, user):
+    session_hash = request.session.get(auth.HASH_SESSION_KEY)
+    if not session_hash:
+        return False
+    current = user.get_session_auth_hash()
+    if constant_time_compare(session_hash, current):
+        return True
+    # Signed with a previous SECRET_KEY: accept it, and re-sign the session.
+    if any(constant_time_compare(session_hash, fallback) for fallback in user.get_session_auth_fallback_hash()):
+        request.session.cycle_key()
+        request.session[auth.HASH_SESSION_KEY] = current
+        return True
+    return False
+
+
+def get_user(request):
+    """Like ``django.contrib.auth.get_user``, but through the cache."""
+    try:
+        user_id = User._meta.pk.to_python(request.session[auth.SESSION_KEY])
+        backend_path = request.session[auth.BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+    if not isinstance(auth.load_backend(backend_path), ModelBackend):
+        return auth.get_user(request)
+
+    user = load_user(user_id)
+    if user is None or not user.is_active:
+        return AnonymousUser()
+    if not _session_verified(request, user):
+        request.session.flush()
+        return AnonymousUser()
+    return user
+
+
+def _cached_user(request):
+    if not hasattr(request, '_cached_user'):
+        request._cached_user = get_user(request)
+    return request._cached_user
+
+
+async def _acached_user(request):
+    if not hasattr(request, '_acached_user'):
+        request._acached_user = await sync_to_async(get_user)(request)
+    return request._acached_user
+
+
+class ProfileAuthenticationMiddleware(AuthenticationMiddleware):
+    """``AuthenticationMiddleware`` whose ``request.user`` comes from :func:`load_user`."""
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: _cached_user(request))
+        request.auser = partial(_acached_user, request)
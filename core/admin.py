@@ -1,3 +1,18 @@
 from django.contrib import admin
 
+from .models import Bed, Ward
+
 # Register your models here.
+
+
+@admin.register(Ward)
+class WardAdmin(admin.ModelAdmin):
+    list_display = ('name', 'capacity', 'occupied')
+    readonly_fields = ('capacity', 'occupied')
+
+
+@admin.register(Bed)
+class BedAdmin(admin.ModelAdmin):
+    list_display = ('number', 'ward', 'occupant')
+    list_filter = ('ward',)
+    readonly_fields = ('occupant',)
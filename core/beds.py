@@ -0,0 +1,146 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import Bed, InpatientRecord, Ward
+
+
+def _adjust(ward_id, field, delta):
+    Ward.objects.filter(pk=ward_id).update(**{field: F(field) + delta})
+
+
+def _claim(bed_number, record):
+    bed = Bed.objects.filter(number=bed_number, occupant__isnull=True).values_list('pk', 'ward_id').first()
+    if bed and Bed.objects.filter(pk=bed[0], occupant__isnull=True).update(occupant=record):
+        _adjust(bed[1], 'occupied', 1)
+
+
+def _free(bed, record):
+    """Free ``bed`` (pk, number, ward_id) held by ``record``.
+
+    If another open admission was recorded against the same bed it takes the
+    bed over, found through the partial open-admissions index.
+    """
+    pk, number, ward_id = bed
+    Bed.objects.filter(pk=pk).update(occupant=None)
+    _adjust(ward_id, 'occupied', -1)
+    waiting = (
+        InpatientRecord.objects.filter(discharged_date__isnull=True, bed_number=number)
+        .exclude(pk=record.pk).order_by('pk').first()
+    )
+    if waiting is not None:
+        _claim(number, waiting)
+
+
+def sync_admission(record):
+    """Point the bed index at ``record``'s bed while it is an open admission.
+
+    Called after every save: a new admission claims its bed, a bed change
+    moves it, and a discharge frees it. A bed already held by another open
+    admission is left with that admission.
+    """
+    wanted = record.bed_number if record.discharged_date is None else None
+    with transaction.atomic():
+        current = Bed.objects.filter(occupant=record).values_list('pk', 'number', 'ward_id').first()
+        if current and current[1] == wanted:
+            return
+        if current:
+            _free(current, record)
+        if wanted is not None:
+            _claim(wanted, record)
+
+
+def release(record):
+    """Free whatever bed ``record`` holds, e.g. before it is deleted."""
+    with transaction.atomic():
+        bed = Bed.objects.filter(occupant=record).values_list('pk', 'number', 'ward_id').first()
+        if bed:
+            _free(bed, record)
+
+
+def bed_added(bed):
+    _adjust(bed.ward_id, 'capacity', 1)
+    if bed.occupant_id:
+        _adjust(bed.ward_id, 'occupied', 1)
+
+
+def bed_changed(bed, previous_ward_id, previously_occupied):
+    """Move a saved bed's counts from its previous ward and occupancy to the current ones."""
+    occupied = bed.occupant_id is not None
+    if (previous_ward_id, previously_occupied) == (bed.ward_id, occupied):
+        return
+    with transaction.atomic():
+        _adjust(previous_ward_id, 'capacity', -1)
+        if previously_occupied:
+            _adjust(previous_ward_id, 'occupied', -1)
+        bed_added(bed)
+
+
+def bed_removed(bed):
+    _adjust(bed.ward_id, 'capacity', -1)
+    if bed.occupant_id:
+        _adjust(bed.ward_id, 'occupied', -1)
+
+
+def occupancy():
+    """Hospital-wide ``{'total', 'occupied', 'free'}`` bed counts.
+
+    Summed from the per-ward counters. Until wards are set up the total
+    falls back to ``HMS_TOTAL_BEDS`` and occupancy to the number of open
+    admissions, counted from the partial open-admissions index.
+    """
+    totals = Ward.objects.aggregate(total=Sum('capacity'), occupied=Sum('occupied'))
+    if totals['total'] is None:
+        totals = {
+            'total': getattr(settings, 'HMS_TOTAL_BEDS', 50),
+            'occupied': InpatientRecord.objects.filter(discharged_date__isnull=True).count(),
+        }
+    totals['free'] = totals['total'] - totals['occupied']
+    return totals
+
+
+def free_by_ward():
+    return list(
+        Ward.objects.order_by('name').annotate(free=F('capacity') - F('occupied'))
+        .values('id', 'name', 'capacity', 'occupied', 'free')
+    )
+
+
+def next_free_bed(ward=None):
+    """Lowest-numbered free bed, optionally within ``ward``; ``None`` if full."""
+    beds = Bed.objects.filter(occupant__isnull=True)
+    if ward is not None:
+        beds = beds.filter(ward=ward)
+    return beds.order_by('ward', 'number').select_related('ward').first()
+
+
+def rebuild():
+    """Rebuild bed assignments and ward counters from open admissions.
+
+    Reads open admissions once through the partial index. If two open
+    admissions claim the same bed, the earliest record keeps it. Returns the
+    number of occupied beds.
+    """
+    open_admissions = {}
+    for bed_number, record_id in (
+        InpatientRecord.objects.filter(discharged_date__isnull=True)
+        .order_by('-pk').values_list('bed_number', 'pk')
+    ):
+        open_admissions[bed_number] = record_id
+
+    with transaction.atomic():
+        beds = list(Bed.objects.only('pk', 'number', 'occupant'))
+        for bed in beds:
+            bed.occupant_id = open_admissions.get(bed.number)
+        Bed.objects.filter(occupant__isnull=False).update(occupant=None)
+        Bed.objects.bulk_update([bed for bed in beds if bed.occupant_id], ['occupant'], batch_size=500)
+
+        wards = list(Ward.objects.annotate(
+            bed_count=Count('beds'),
+            occupied_count=Count('beds', filter=Q(beds__occupant__isnull=False)),
+        ))
+        for ward in wards:
+            ward.capacity = ward.bed_count
+            ward.occupied = ward.occupied_count
+        Ward.objects.bulk_update(wards, ['capacity', 'occupied'])
+    return sum(ward.occupied for ward in wards)
@@ -0,0 +1,151 @@
+"""Helpers shared by the ``bench_*`` management commands.
+
+Benchmarks run against a throwaway database created the same way the test
+runner creates one, so they never touch the real ``db.sqlite3``.
+"""
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import DEFAULT_DB_ALIAS
+from django.test.utils import setup_databases, teardown_databases
+
+from .models import Appointment, InpatientRecord, OutpatientRecord, PatientProfile, StaffProfile, User
+from .sequences import HOSPITAL_CODE, format_admission_number
+
+SEED_PASSWORD = 'bench-password'
+
+
+@contextmanager
+def isolated_database(verbosity=0):
+    config = setup_databases(verbosity, interactive=False, aliases={DEFAULT_DB_ALIAS})
+    try:
+        yield
+    finally:
+        teardown_databases(config, verbosity)
+
+
+def timed(fn, *args, **kwargs):
+    """Call ``fn`` and return ``(elapsed_ms, result)``."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return (time.perf_counter() - start) * 1000, result
+
+
+def summarize(samples_ms):
+    ordered = sorted(samples_ms)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        'n': len(ordered),
+        'mean': statistics.fmean(ordered),
+        'p50': percentile(50),
+        'p95': percentile(95),
+        'p99': percentile(99),
+        'max': ordered[-1],
+    }
+
+
+def format_summary(summary):
+    return 'p50={p50:.3f}ms p95={p95:.3f}ms p99={p99:.3f}ms max={max:.3f}ms (n={n})'.format(**summary)
+
+
+def seed_patients(count, start=0, batch_size=5000, year=None, name=None):
+    """Bulk-create ``count`` patient users and profiles numbered from ``start``.
+
+    Every user shares one precomputed password hash, so seeding is bounded by
+    insert speed rather than PBKDF2. ``name`` maps a patient number to a name.
+    """
+    name = name or (lambda n: f"Patient {n}")
+    year = year or datetime.now().year
+    password = make_password(SEED_PASSWORD)
+    for offset in range(start, start + count, batch_size):
+        numbers = range(offset, min(offset + batch_size, start + count))
+        users = User.objects.bulk_create(
+            [User(mobile=f"7{n:09d}", role='patient', password=password) for n in numbers]
+        )
+        PatientProfile.objects.bulk_create([
+            PatientProfile(
+                user=user,
+                name=name(n),
+                date_of_birth=date(1940 + n % 70, n % 12 + 1, n % 28 + 1),
+                gender=('male', 'female', 'other')[n % 3],
+                contact=user.mobile,
+                aadhaar_number=f"{n:012d}",
+                address=f"{n} Hospital Road",
+                admission_number=format_admission_number(HOSPITAL_CODE, year, n + 1),
+            )
+            for n, user in zip(numbers, users)
+        ])
+
+
+def seed_staff(count, start=0, role='doctor'):
+    """Bulk-create ``count`` staff users and profiles; returns the profiles."""
+    password = make_password(SEED_PASSWORD)
+    users = User.objects.bulk_create(
+        [User(mobile=f"6{n:09d}", role='staff', password=password) for n in range(start, start + count)]
+    )
+    return StaffProfile.objects.bulk_create([
+        StaffProfile(
+            user=user, name=f"Staff {n}", date_of_birth=date(1970 + n % 30, n % 12 + 1, n % 28 + 1),
+            gender=('male', 'female')[n % 2], role=role, qualification='MBBS',
+            contact=user.mobile, address=f"{n} Staff Quarters",
+        )
+        for n, user in zip(range(start, start + count), users)
+    ])
+
+
+def seed_appointments(patient_ids, count, days=30, end=None, batch_size=5000):
+    """Bulk-create ``count`` appointments spread over the ``days`` up to ``end``.
+
+    Tokens are numbered per day in booking order, as the dispenser would.
+    """
+    end = end or date.today()
+    tokens = {}
+    for offset in range(0, count, batch_size):
+        rows = []
+        for n in range(offset, min(offset + batch_size, count)):
+            day = end - timedelta(days=n % days)
+            tokens[day] = tokens.get(day, 0) + 1
+            rows.append(Appointment(
+                patient_id=patient_ids[n % len(patient_ids)], appointment_date=day,
+                symptom_or_disease=('Fever', 'Cough', 'Headache', 'Back pain')[n % 4],
+                admission_number=f"BENCH{n:09d}", token_number=tokens[day],
+                is_priority=n % 10 == 0, status=('Booked', 'Called', 'Completed')[n % 3],
+            ))
+        Appointment.objects.bulk_create(rows)
+
+
+def seed_records(patient_ids, staff_ids, inpatients, outpatients, days=365, end=None, batch_size=5000):
+    """Bulk-create clinical records spread over the ``days`` up to ``end``.
+
+    Signals do not fire, so rebuild the census, beds and indexes afterwards.
+    """
+    end = end or date.today()
+    for offset in range(0, inpatients, batch_size):
+        InpatientRecord.objects.bulk_create([
+            InpatientRecord(
+                patient_id=patient_ids[n % len(patient_ids)], created_by_id=staff_ids[n % len(staff_ids)],
+                bed_number=n % 50 + 1, case_type=('General', 'Surgery', 'Maternity')[n % 3],
+                admitted_date=end - timedelta(days=n % days),
+                # Most admissions have been discharged; a few are still open.
+                discharged_date=None if n % 20 == 0 else end - timedelta(days=n % days) + timedelta(days=n % 7),
+                treatment_plan=f"Observation and rest, plan {n}",
+            )
+            for n in range(offset, min(offset + batch_size, inpatients))
+        ])
+    for offset in range(0, outpatients, batch_size):
+        OutpatientRecord.objects.bulk_create([
+            OutpatientRecord(
+                patient_id=patient_ids[n % len(patient_ids)], created_by_id=staff_ids[n % len(staff_ids)],
+                visit_date=end - timedelta(days=n % days),
+                symptoms=('Fever and chills', 'Dry cough', 'Persistent headache', 'Lower back pain')[n % 4],
+                diagnosis=('Viral fever', 'Bronchitis', 'Migraine', 'Muscle strain')[n % 4],
+                prescription=f"Paracetamol 500mg, review {n}",
+            )
+            for n in range(offset, min(offset + batch_size, outpatients))
+        ])
@@ -0,0 +1,110 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+
+from .models import DailyCensus, InpatientRecord, OutpatientRecord
+from .predictor import cached_forecast, train_predict_model
+
+CENSUS_FIELDS = ('admissions', 'discharges', 'outpatient_visits')
+
+# Days of history the live forecast is trained on, and how many of them must
+# have activity before it is trusted over the bundled CSV seed data.
+FORECAST_WINDOW_DAYS = 30
+MIN_ACTIVE_DAYS = 7
+
+
+def bump(day, field, delta):
+    """Add ``delta`` to ``field`` of the census row for ``day``."""
+    if day is None or not delta:
+        return
+    changes = {field: F(field) + delta, 'updated_at': timezone.now()}
+    if DailyCensus.objects.filter(date=day).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            DailyCensus.objects.create(date=day, **{field: delta})
+    except IntegrityError:
+        # Another writer created the row first.
+        DailyCensus.objects.filter(date=day).update(**changes)
+
+
+def apply_changes(field, old_day, new_day):
+    """Move one count of ``field`` from ``old_day`` to ``new_day``."""
+    if old_day == new_day:
+        return
+    with transaction.atomic():
+        bump(old_day, field, -1)
+        bump(new_day, field, 1)
+
+
+def rebuild(batch_size=500):
+    """Recompute the whole census from the raw record tables.
+
+    Each source is read with one GROUP BY, so the cost is one pass over the
+    records plus one bulk insert per ``batch_size`` days.
+    """
+    totals = defaultdict(lambda: dict.fromkeys(CENSUS_FIELDS, 0))
+    sources = [
+        (InpatientRecord.objects.all(), 'admitted_date', 'admissions'),
+        (InpatientRecord.objects.filter(discharged_date__isnull=False), 'discharged_date', 'discharges'),
+        (OutpatientRecord.objects.all(), 'visit_date', 'outpatient_visits'),
+    ]
+    for queryset, date_field, field in sources:
+        rows = queryset.order_by().values_list(date_field).annotate(n=Count('id'))
+        for day, n in rows:
+            totals[day][field] = n
+
+    rows = [DailyCensus(date=day, **counts) for day, counts in sorted(totals.items())]
+    with transaction.atomic():
+        DailyCensus.objects.all().delete()
+        DailyCensus.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def series(field, start, end):
+    """Daily values of ``field`` from ``start`` to ``end`` inclusive, zero-filled."""
+    values = dict(
+        DailyCensus.objects.filter(date__range=(start, end)).values_list('date', field)
+    )
+    days = (end - start).days + 1
+    return [values.get(start + timedelta(days=i), 0) for i in range(days)]
+
+
+def moving_average(field, days=14, default=0):
+    """Average of ``field`` over the days with activity in the last ``days`` days."""
+    today = timezone.now().date()
+    counts = DailyCensus.objects.filter(
+        date__gte=today - timedelta(days=days), **{f'{field}__gt': 0}
+    ).values_list(field, flat=True)
+    counts = list(counts)
+    if not counts:
+        return default
+    return sum(counts) // len(counts)
+
+
+def forecast(field, fallback_csv):
+    """Forecast tomorrow's ``field`` from the live census.
+
+    The fitted model is cached against the census high-water mark for the
+    training window, so it is only refitted after the census changes. Until
+    enough live history exists the bundled CSV seed data is used instead.
+    """
+    end = timezone.now().date() - timedelta(days=1)
+    start = end - timedelta(days=FORECAST_WINDOW_DAYS - 1)
+    window = DailyCensus.objects.filter(date__range=(start, end))
+    marks = window.aggregate(
+        updated=Max('updated_at'),
+        active_days=Count('id', filter=Q(**{f'{field}__gt': 0})),
+    )
+    if marks['active_days'] < MIN_ACTIVE_DAYS:
+        return train_predict_model(fallback_csv)
+
+    result = cached_forecast(
+        ('census', field),
+        (start, end, marks['updated'], marks['active_days']),
+        lambda: series(field, start, end),
+    )
+    return max(0, result.prediction)
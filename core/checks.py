@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core import checks
+
+PER_PROCESS_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_user_cache_is_shared(app_configs, **kwargs):
+    """The cached users (core.accounts) must be dropped in every worker, so their cache must be shared."""
+    alias = getattr(settings, 'HMS_USER_CACHE', 'default')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend not in PER_PROCESS_CACHES:
+        return []
+    return [checks.Warning(
+        f"HMS_USER_CACHE uses the per-process cache '{alias}' ({backend}).",
+        hint=(
+            'With several workers a password change or deactivation only reaches the worker that '
+            'made it; other workers serve the old user for up to HMS_USER_CACHE_TTL seconds. '
+            'Point HMS_USER_CACHE at a shared cache (Redis, memcached) or run a single worker.'
+        ),
+        id='core.W001',
+    )]
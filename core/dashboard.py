@@ -0,0 +1,70 @@
+"""Admin dashboard counters, fetched in one query and cached briefly.
+
+The cache lives in the ``HMS_DASHBOARD_CACHE`` alias for
+``HMS_DASHBOARD_CACHE_TTL`` seconds and is dropped by ``core.signals``
+whenever a model feeding it is saved or deleted. With a per-process cache
+such as locmem, other processes see the change when their TTL expires.
+
+Counts read from a read replica are cached apart from counts read from the
+primary. A lagging replica then can't put stale counts in front of a client
+that is pinned to the primary after its own write.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections, router
+
+from . import beds
+from .models import InpatientRecord, OutpatientRecord, PatientProfile, StaffProfile
+
+CACHE_KEY = 'hms:dashboard:stats:{}'
+
+COUNTERS = ('total_patients', 'total_inpatients', 'total_outpatients', 'total_staff', 'total_doctors')
+
+
+def _cache():
+    return caches[getattr(settings, 'HMS_DASHBOARD_CACHE', 'default')]
+
+
+def fetch_counts(using=DEFAULT_DB_ALIAS):
+    """Return every dashboard counter from a single round trip.
+
+    Each table is counted by its own scalar subquery; staff and doctors come
+    from one pass over the staff table using conditional aggregation.
+    """
+    connection = connections[using]
+    qn = connection.ops.quote_name
+
+    def table(model):
+        return qn(model._meta.db_table)
+
+    sql = (
+        f'SELECT (SELECT COUNT(*) FROM {table(PatientProfile)}), '
+        f'(SELECT COUNT(*) FROM {table(InpatientRecord)}), '
+        f'(SELECT COUNT(*) FROM {table(OutpatientRecord)}), '
+        f'staff.total, staff.doctors '
+        f'FROM (SELECT COUNT(*) AS total, '
+        f'COUNT(CASE WHEN {qn("role")} = %s THEN 1 END) AS doctors '
+        f'FROM {table(StaffProfile)}) staff'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, ['doctor'])
+        row = cursor.fetchone()
+    return dict(zip(COUNTERS, row))
+
+
+def get_dashboard_stats():
+    """Counters plus bed occupancy, served from cache when fresh."""
+    cache = _cache()
+    # Raw SQL bypasses the routers, so ask them which database to read.
+    using = router.db_for_read(PatientProfile)
+    key = CACHE_KEY.format(using)
+    stats = cache.get(key)
+    if stats is None:
+        stats = fetch_counts(using)
+        stats['beds'] = beds.occupancy()
+        cache.set(key, stats, getattr(settings, 'HMS_DASHBOARD_CACHE_TTL', 30))
+    return stats
+
+
+def invalidate():
+    _cache().delete_many([CACHE_KEY.format(alias) for alias in connections])
@@ -0,0 +1,276 @@
+"""Typeahead lookup of patients by name, mobile, Aadhaar or admission number.
+
+Every patient has a few normalized keys in ``PatientLookupKey``: the full
+name, each later word of the name (so "kumar" finds "Ravi Kumar"), the digits
+of the mobile and Aadhaar numbers, and the admission number. A prefix lookup
+is then one range scan on the key index, however many patients there are.
+
+If a name matches nothing as typed, common one-typo variants of it are
+tried as prefixes instead, so "Karthk" or "Revathy" still find the patient.
+Each variant is one bounded index seek.
+
+Recent answers are kept in a per-process LRU. Any patient change bumps a
+generation number in the ``HMS_LOOKUP_CACHE`` alias, and every process then
+drops its LRU.
+"""
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+
+from .models import PatientLookupKey, PatientProfile
+
+NAME, CONTACT, AADHAAR, ADMISSION = 1, 2, 3, 4
+FIELD_LABELS = dict(PatientLookupKey.FIELD_CHOICES)
+
+KEY_LENGTH = 100
+MIN_QUERY_LENGTH = 2
+FUZZY_MIN_LENGTH = 4
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+# SQLite allows 500 terms in one compound SELECT.
+VARIANTS_PER_QUERY = 400
+
+GENERATION_KEY = 'patient_lookup:generation'
+
+
+def normalize(text):
+    """Lower-case letters and digits without accents, single-spaced."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c if c.isalnum() else ' ' for c in text if not unicodedata.combining(c))
+    return ' '.join(text.lower().split())
+
+
+def digits(text):
+    return ''.join(c for c in text or '' if c.isdigit())
+
+
+def patient_keys(name, contact, aadhaar_number, admission_number):
+    """The ``(field, key)`` pairs stored for one patient."""
+    keys = set()
+    words = normalize(name).split()
+    for i in range(len(words)):
+        keys.add((NAME, ' '.join(words[i:])[:KEY_LENGTH]))
+    for field, value in ((CONTACT, digits(contact)), (AADHAAR, digits(aadhaar_number)),
+                         (ADMISSION, normalize(admission_number).replace(' ', ''))):
+        if value:
+            keys.add((field, value[:KEY_LENGTH]))
+    return keys
+
+
+def _key_rows(patients):
+    return [
+        PatientLookupKey(patient_id=pk, field=field, key=key)
+        for pk, *values in patients
+        for field, key in patient_keys(*values)
+    ]
+
+
+KEY_SOURCE_FIELDS = ('pk', 'name', 'contact', 'aadhaar_number', 'admission_number')
+
+
+def index_patients(patients):
+    """(Re)write the keys of the given ``PatientProfile`` instances."""
+    patients = list(patients)
+    rows = _key_rows(
+        (p.pk, p.name, p.contact, p.aadhaar_number, p.admission_number) for p in patients
+    )
+    with transaction.atomic():
+        PatientLookupKey.objects.filter(patient__in=[p.pk for p in patients]).delete()
+        PatientLookupKey.objects.bulk_create(rows, batch_size=1000)
+    invalidate()
+
+
+def rebuild(batch_size=5000):
+    """Recompute every patient's keys. Returns the number of keys written."""
+    total = 0
+    with transaction.atomic():
+        PatientLookupKey.objects.all().delete()
+        source = PatientProfile.objects.order_by('pk').values_list(*KEY_SOURCE_FIELDS)
+        batch = []
+        for row in source.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) == batch_size:
+                total += len(PatientLookupKey.objects.bulk_create(_key_rows(batch), batch_size=1000))
+                batch = []
+        total += len(PatientLookupKey.objects.bulk_create(_key_rows(batch), batch_size=1000))
+    invalidate()
+    return total
+
+
+def _successor(prefix):
+    """Smallest string greater than every string starting with ``prefix``."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+# Letters commonly typed in place of each other in transliterated names.
+CONFUSABLE = {
+    'a': 'eiou', 'e': 'aiy', 'i': 'eyu', 'o': 'au', 'u': 'oa', 'y': 'ie',
+    'b': 'p', 'p': 'bf', 'f': 'p', 'c': 'ks', 'k': 'cq', 'q': 'k', 's': 'zc', 'z': 's',
+    'd': 't', 't': 'd', 'g': 'j', 'j': 'g', 'l': 'r', 'r': 'l', 'm': 'n', 'n': 'm',
+    'v': 'w', 'w': 'v',
+}
+# Letters commonly left out of, or added to, a name ("Karthik"/"Kartik").
+OPTIONAL = 'aeiouh'
+
+
+def edit_variants(query):
+    """Common one-typo variants of ``query``, excluding ``query`` itself.
+
+    Covers a dropped, doubled or swapped letter, a missing or extra vowel or
+    'h', and mixed-up vowels or sound-alike consonants. That keeps the count
+    to a few per letter, where every possible edit would be over fifty.
+    Edits to the last letter are covered by the prefix ``query[:-1]``, which
+    is included instead.
+    """
+    head = query[:-1]
+    variants = {head}
+    for i, letter in enumerate(head):
+        variants.add(query[:i] + query[i + 1:])                                # dropped
+        variants.add(query[:i] + query[i + 1] + letter + query[i + 2:])        # swapped
+        for other in CONFUSABLE.get(letter, ''):
+            variants.add(query[:i] + other + query[i + 1:])                   # mixed up
+        for extra in OPTIONAL + letter:
+            variants.add(query[:i] + extra + query[i:])                       # left out
+    variants.discard(query)
+    return sorted(v for v in variants if len(v) >= MIN_QUERY_LENGTH and not v.endswith(' '))
+
+
+def _scan(prefixes, limit):
+    """``(patient_id, field, key)`` rows whose key starts with any prefix.
+
+    Each prefix is its own index range seek capped at ``limit`` rows, so a
+    broad variant cannot make the lookup scan the table.
+    """
+    qn = connection.ops.quote_name
+    opts = PatientLookupKey._meta
+    select = (
+        f'SELECT * FROM (SELECT {qn(opts.get_field("patient").column)}, {qn("field")}, {qn("key")} '
+        f'FROM {qn(opts.db_table)} WHERE {qn("key")} >= %s AND {qn("key")} < %s '
+        f'ORDER BY {qn("key")} LIMIT %s)'
+    )
+    rows = []
+    with connection.cursor() as cursor:
+        for start in range(0, len(prefixes), VARIANTS_PER_QUERY):
+            chunk = prefixes[start:start + VARIANTS_PER_QUERY]
+            params = []
+            for prefix in chunk:
+                params.extend([prefix, _successor(prefix), limit])
+            cursor.execute(' UNION ALL '.join([select] * len(chunk)), params)
+            rows.extend(cursor.fetchall())
+    return rows
+
+
+def _unique_patients(rows, limit, seen):
+    matches = []
+    for patient_id, field, key in sorted(rows, key=lambda row: row[2]):
+        if patient_id not in seen:
+            seen.add(patient_id)
+            matches.append((patient_id, field))
+            if len(matches) == limit:
+                break
+    return matches
+
+
+def _search(query, limit):
+    seen = set()
+    matches = _unique_patients(_scan([query], limit * 2), limit, seen)
+    exact = len(matches)
+    # Typo tolerance is for names, and only when nothing matched as typed.
+    if not exact and len(query) >= FUZZY_MIN_LENGTH and query.replace(' ', '').isalpha():
+        matches += _unique_patients(_scan(edit_variants(query), limit), limit - exact, seen)
+
+    patients = PatientProfile.objects.only(
+        'name', 'contact', 'admission_number', 'date_of_birth'
+    ).in_bulk([patient_id for patient_id, _ in matches])
+    return [
+        {
+            'id': patient_id,
+            'name': patients[patient_id].name,
+            'admission_number': patients[patient_id].admission_number,
+            'contact': patients[patient_id].contact,
+            'date_of_birth': patients[patient_id].date_of_birth,
+            'matched': FIELD_LABELS[field],
+            'exact': i < exact,
+        }
+        for i, (patient_id, field) in enumerate(matches)
+        if patient_id in patients
+    ]
+
+
+class LookupCache:
+    """A small thread-safe LRU of recent lookups, cleared on a generation change."""
+
+    def __init__(self, size):
+        self.size = size
+        self.generation = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, generation):
+        with self._lock:
+            if generation != self.generation:
+                self._entries.clear()
+                self.generation = generation
+                return None
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, generation):
+        with self._lock:
+            if generation != self.generation or not self.size:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+
+_cache = LookupCache(getattr(settings, 'HMS_LOOKUP_CACHE_SIZE', 1024))
+
+
+def _shared_cache():
+    return caches[getattr(settings, 'HMS_LOOKUP_CACHE', 'default')]
+
+
+def current_generation():
+    return _shared_cache().get(GENERATION_KEY, 0)
+
+
+def invalidate():
+    shared = _shared_cache()
+    shared.add(GENERATION_KEY, 0, None)
+    try:
+        shared.incr(GENERATION_KEY)
+    except ValueError:
+        # Evicted between add() and incr(); starting over still changes it.
+        shared.set(GENERATION_KEY, 1, None)
+
+
+def lookup(query, limit=DEFAULT_LIMIT):
+    """Patients whose name, mobile, Aadhaar or admission number starts with ``query``.
+
+    Names that match nothing fall back to typo-tolerant matching. Returns a
+    list of small dicts, best matches first.
+    """
+    query = normalize(query)[:KEY_LENGTH]
+    limit = max(1, min(limit, MAX_LIMIT))
+    if len(query) < MIN_QUERY_LENGTH:
+        return []
+    # Numbers are often typed with separators ("98765 43210").
+    if digits(query) and query.replace(' ', '').isdigit():
+        query = digits(query)
+
+    generation = current_generation()
+    key = (query, limit)
+    results = _cache.get(key, generation)
+    if results is None:
+        results = _search(query, limit)
+        _cache.put(key, results, generation)
+    return results
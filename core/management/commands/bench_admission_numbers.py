@@ -0,0 +1,56 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+
+from core.bench import format_summary, isolated_database, seed_patients, summarize, timed
+from core.models import AdmissionSequence, PatientProfile
+from core.sequences import HOSPITAL_CODE, allocate_admission_numbers
+
+
+def legacy_scan(hospital_code, year):
+    # The pre-sequence allocator: read every number for the year and take the max.
+    last_serial = 0
+    for adm_num in PatientProfile.objects.filter(
+        admission_number__startswith=f"{hospital_code}{year}"
+    ).values_list('admission_number', flat=True):
+        try:
+            last_serial = max(last_serial, int(adm_num[-6:]))
+        except ValueError:
+            continue
+    return last_serial + 1
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks admission-number allocation as the patient table grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=1_000_000,
+                            help='Largest patient count to measure at')
+        parser.add_argument('--samples', type=int, default=200,
+                            help='Allocations timed at each scale')
+        parser.add_argument('--legacy-samples', type=int, default=3,
+                            help='Full-scan allocations timed at each scale (0 to skip)')
+
+    def handle(self, *args, **options):
+        scales = [n for n in (1_000, 10_000, 100_000, 1_000_000) if n < options['patients']]
+        scales.append(options['patients'])
+
+        year = datetime.now().year
+        with isolated_database():
+            seeded = 0
+            for scale in scales:
+                seed_patients(scale - seeded, start=seeded)
+                seeded = scale
+
+                # Drop the counter so the first call re-seeds it from the table.
+                AdmissionSequence.objects.all().delete()
+                seed_ms, _ = timed(allocate_admission_numbers, 1, HOSPITAL_CODE, year)
+                samples = [
+                    timed(allocate_admission_numbers, 1, HOSPITAL_CODE, year)[0]
+                    for _ in range(options['samples'])
+                ]
+                line = f"{scale:>9,} patients  sequence {format_summary(summarize(samples))}  seed={seed_ms:.3f}ms"
+                if options['legacy_samples']:
+                    legacy = [timed(legacy_scan, HOSPITAL_CODE, year)[0] for _ in range(options['legacy_samples'])]
+                    line += f"  legacy scan p50={summarize(legacy)['p50']:.1f}ms"
+                self.stdout.write(line)
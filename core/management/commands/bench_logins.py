@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, override_settings
+
+from core.bench import SEED_PASSWORD, format_summary, isolated_database, seed_patients, summarize
+from core.models import PatientProfile, User
+from core.passwords import get_executor
+
+
+def hashers_preferring(name):
+    """``PASSWORD_HASHERS`` with ``name`` first, as settings builds it."""
+    preferred = settings.HMS_PASSWORD_HASHERS[name]
+    return [preferred] + [hasher for hasher in settings.PASSWORD_HASHERS if hasher != preferred]
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks concurrent logins through the async login view for each password hasher'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=48, help='Logins per measurement, one per user')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16],
+                            help='Logins in flight at once')
+        parser.add_argument('--hashers', nargs='+', default=['pbkdf2', 'scrypt'],
+                            choices=sorted(settings.HMS_PASSWORD_HASHERS))
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Hashing pool: {get_executor()._max_workers} threads')
+        with isolated_database():
+            for name in options['hashers']:
+                with override_settings(PASSWORD_HASHERS=hashers_preferring(name)):
+                    mobiles = self.seed(options['users'])
+                    for concurrency in options['concurrency']:
+                        self.report(name, f'x{concurrency}', self.measure(mobiles, concurrency))
+
+            # Rehash on login: stored with the first hasher, preferring the last.
+            old, new = options['hashers'][0], options['hashers'][-1]
+            if old != new:
+                with override_settings(PASSWORD_HASHERS=hashers_preferring(old)):
+                    mobiles = self.seed(options['users'])
+                with override_settings(PASSWORD_HASHERS=hashers_preferring(new)):
+                    concurrency = max(options['concurrency'])
+                    self.report(f'{old}->{new}', 'rehash', self.measure(mobiles, concurrency))
+                    upgraded = User.objects.filter(password__startswith=f'{new}$').count()
+                    if upgraded != len(mobiles):
+                        raise CommandError(f'Only {upgraded} of {len(mobiles)} passwords were rehashed')
+                    self.report(new, 'after', self.measure(mobiles, concurrency))
+
+    def seed(self, count):
+        PatientProfile.objects.all().delete()
+        User.objects.all().delete()
+        seed_patients(count)
+        return list(User.objects.values_list('mobile', flat=True))
+
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def measure(self, mobiles, concurrency):
+        return asyncio.run(self.login_all(mobiles, concurrency))
+
+    async def login_all(self, mobiles, concurrency):
+        gate = asyncio.Semaphore(concurrency)
+        latencies, failures = [], []
+
+        async def login(mobile):
+            async with gate:
+                client = AsyncClient()
+                start = time.perf_counter()
+                response = await client.post('/login/', {'mobile': mobile, 'password': SEED_PASSWORD})
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 302:
+                    failures.append(mobile)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(login(mobile) for mobile in mobiles))
+        elapsed = time.perf_counter() - start
+        if failures:
+            raise CommandError(f'{len(failures)} logins failed, e.g. {failures[0]}')
+        return len(mobiles) / elapsed, latencies
+
+    def report(self, hasher, label, result):
+        rate, latencies = result
+        self.stdout.write(f'{hasher:<14} {label:<7} {rate:7.1f} logins/s  {format_summary(summarize(latencies))}')
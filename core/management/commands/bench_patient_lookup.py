@@ -0,0 +1,103 @@
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import lookup
+from core.bench import format_summary, isolated_database, seed_patients, summarize, timed
+from core.models import PatientProfile
+
+FIRST_NAMES = [
+    'Aarav', 'Aditi', 'Akash', 'Ananya', 'Arjun', 'Bhavya', 'Deepak', 'Divya', 'Gautam', 'Harini',
+    'Ishaan', 'Janani', 'Karthik', 'Kavya', 'Lakshmi', 'Manoj', 'Meena', 'Naveen', 'Nisha', 'Pooja',
+    'Prakash', 'Priya', 'Rahul', 'Ramesh', 'Revathi', 'Sanjay', 'Saranya', 'Suresh', 'Swathi', 'Vasan',
+]
+LAST_NAMES = [
+    'Annamalai', 'Balasubramanian', 'Chandrasekar', 'Dhanapal', 'Ganesan', 'Iyer', 'Jayaraman',
+    'Krishnan', 'Kumar', 'Murugan', 'Natarajan', 'Palani', 'Raghavan', 'Rajendran', 'Ramasamy',
+    'Selvam', 'Shankar', 'Srinivasan', 'Subramani', 'Venkatesh',
+]
+
+
+def patient_name(n):
+    # Deterministic, and plenty of shared first and last names, as in real data.
+    initial = chr(ord('A') + n // 600 % 26)
+    return f"{FIRST_NAMES[n % 30]} {initial} {LAST_NAMES[n // 30 % 20]}"
+
+
+def typo(word, rng):
+    """A realistic misspelling: dropped, swapped or doubled letter, or a vowel mix-up."""
+    word = word.lower()
+    i = rng.randrange(1, len(word) - 1)
+    edit = rng.choice(('drop', 'swap', 'double', 'vowel'))
+    if edit == 'drop':
+        return word[:i] + word[i + 1:]
+    if edit == 'swap':
+        return word[:i - 1] + word[i] + word[i - 1] + word[i + 1:]
+    if edit == 'double':
+        return word[:i] + word[i] + word[i:]
+    vowels = [j for j in range(1, len(word)) if word[j] in 'aeiou']
+    j = rng.choice(vowels) if vowels else i
+    return word[:j] + rng.choice([v for v in 'aeiou' if v != word[j]]) + word[j + 1:]
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks typeahead patient lookup as the patient table grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=1_000_000,
+                            help='Largest patient count to measure at')
+        parser.add_argument('--samples', type=int, default=300,
+                            help='Lookups timed per query type at each scale')
+        parser.add_argument('--target-ms', type=float, default=10.0,
+                            help='Fail if any uncached p99 exceeds this')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        scales = [n for n in (1_000, 10_000, 100_000, 1_000_000) if n < options['patients']]
+        scales.append(options['patients'])
+        rng = random.Random(options['seed'])
+        worst = 0.0
+
+        with isolated_database():
+            seeded = 0
+            for scale in scales:
+                seed_patients(scale - seeded, start=seeded, name=patient_name)
+                seeded = scale
+                rebuild_ms, keys = timed(lookup.rebuild)
+                self.stdout.write(f"{scale:>9,} patients  {keys:,} keys rebuilt in {rebuild_ms / 1000:.1f}s")
+
+                queries = self.queries(scale, options['samples'], rng)
+                for kind, terms in queries.items():
+                    # Bypass the LRU so every sample hits the index.
+                    samples = [timed(lookup._search, lookup.normalize(term), lookup.DEFAULT_LIMIT)[0]
+                               for term in terms]
+                    summary = summarize(samples)
+                    worst = max(worst, summary['p99'])
+                    self.stdout.write(f"    {kind:<16} {format_summary(summary)}")
+
+                terms = queries['name prefix']
+                for term in terms:
+                    lookup.lookup(term)
+                cached = summarize([timed(lookup.lookup, term)[0] for term in terms])
+                self.stdout.write(f"    {'cached (LRU)':<16} {format_summary(cached)}")
+
+        if worst > options['target_ms']:
+            raise CommandError(f'Slowest uncached p99 was {worst:.2f}ms, over the {options["target_ms"]}ms target')
+        self.stdout.write(self.style.SUCCESS(
+            f'Every uncached p99 within {options["target_ms"]}ms (worst {worst:.2f}ms).'
+        ))
+
+    def queries(self, scale, samples, rng):
+        profiles = list(
+            PatientProfile.objects.filter(pk__in=[rng.randrange(1, scale + 1) for _ in range(samples)])
+            .values_list('name', 'contact', 'aadhaar_number', 'admission_number')
+        )
+        pick = [rng.choice(profiles) for _ in range(samples)]
+        return {
+            'name prefix': [name[:rng.randrange(2, len(name) + 1)] for name, *_ in pick],
+            'surname': [name.split()[-1][:rng.randrange(3, 8)] for name, *_ in pick],
+            'name typo': [typo(name.split()[0], rng) for name, *_ in pick],
+            'mobile prefix': [contact[:rng.randrange(4, 11)] for _, contact, *_ in pick],
+            'aadhaar prefix': [aadhaar[:rng.randrange(4, 13)] for _, _, aadhaar, _ in pick],
+            'admission no.': [number[:rng.randrange(8, 17)] for *_, number in pick],
+        }
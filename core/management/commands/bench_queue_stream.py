@@ -0,0 +1,62 @@
+import asyncio
+import json
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.bench import format_summary, summarize
+from core.queue_events import LocalBroker, event_stream, format_sse
+
+
+class Command(BaseCommand):
+    help = 'Load-tests queue event fan-out to many concurrent stream subscribers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=500)
+        parser.add_argument('--events', type=int, default=50)
+        parser.add_argument('--interval', type=float, default=0.01,
+                            help='Seconds between published events')
+
+    def handle(self, *args, **options):
+        latencies, delivered = asyncio.run(self.run(**options))
+        expected = options['subscribers'] * options['events']
+        self.stdout.write(
+            f"{options['subscribers']} subscribers x {options['events']} events: "
+            f"{delivered}/{expected} delivered"
+        )
+        if latencies:
+            self.stdout.write(f'publish-to-frame latency {format_summary(summarize(latencies))}')
+
+    async def run(self, subscribers, events, interval, **options):
+        broker = LocalBroker(max_pending=events)
+        channel = 'queue:bench'
+        latencies = []
+
+        async def display():
+            # Each subscriber consumes the same SSE generator the view serves.
+            received = 0
+            async for frame in event_stream(channel, broker=broker):
+                if frame.startswith('event:'):
+                    payload = json.loads(frame.split('data: ', 1)[1])
+                    latencies.append((time.perf_counter() - payload['sent']) * 1000)
+                    received += 1
+                    if received == events:
+                        return received
+            return received
+
+        tasks = [asyncio.create_task(display()) for _ in range(subscribers)]
+        while broker.subscriber_count(channel) < subscribers:
+            await asyncio.sleep(0.01)
+
+        def publish():
+            # Publish from another thread, as a sync Django view would.
+            for n in range(events):
+                broker.publish(channel, format_sse({'event': 'booked', 'token_number': n, 'sent': time.perf_counter()}))
+                time.sleep(interval)
+
+        publisher = threading.Thread(target=publish)
+        publisher.start()
+        received = await asyncio.wait_for(asyncio.gather(*tasks), timeout=60 + events * interval)
+        publisher.join()
+        return latencies, sum(received)
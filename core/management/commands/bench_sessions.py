@@ -0,0 +1,68 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.bench import format_summary, isolated_database, seed_patients, summarize
+from core.metrics import QueryRecorder
+from core.models import User
+from hospital_system.sessions import ENGINES
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the patient_home flow under each HMS_SESSION_MODE'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50, help='Patients logged in at once')
+        parser.add_argument('--requests', type=int, default=20, help='patient_home requests per patient')
+        parser.add_argument('--modes', nargs='+', default=list(ENGINES), choices=list(ENGINES))
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Configured mode: {settings.HMS_SESSION_MODE}')
+        with isolated_database():
+            seed_patients(options['users'])
+            users = list(User.objects.filter(role='patient').order_by('pk'))
+            for mode in options['modes']:
+                with override_settings(SESSION_ENGINE=ENGINES[mode]):
+                    self.report(mode, *self.measure(users, options['requests']))
+
+    def measure(self, users, repeat):
+        Session.objects.all().delete()
+        for cache in caches.all():
+            cache.clear()
+
+        # Logging in creates and saves the session.
+        clients, logins = [], []
+        for user in users:
+            # DEBUG allows localhost without ALLOWED_HOSTS; the test runner's 'testserver' is not set up here.
+            client = Client(HTTP_HOST='localhost')
+            start = time.perf_counter()
+            client.force_login(user)
+            logins.append((time.perf_counter() - start) * 1000)
+            clients.append(client)
+
+        # Then each patient opens their home page, in turn, ``repeat`` times.
+        url = reverse('patient_home')
+        latencies, queries = [], 0
+        for _ in range(repeat):
+            for client in clients:
+                recorder = QueryRecorder()
+                start = time.perf_counter()
+                with connection.execute_wrapper(recorder):
+                    response = client.get(url)
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200 or not response.wsgi_request.user.is_authenticated:
+                    raise CommandError(f'patient_home was not served to a logged-in patient ({response.status_code})')
+                queries = max(queries, recorder.count)
+        return summarize(logins), summarize(latencies), queries, Session.objects.count()
+
+    def report(self, mode, logins, latencies, queries, rows):
+        self.stdout.write(f'{mode:<15} login        {format_summary(logins)}')
+        self.stdout.write(
+            f'{"":<15} patient_home {format_summary(latencies)}  queries {queries}  session rows {rows}'
+        )
@@ -0,0 +1,74 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Modules a worker should not load until it actually fits a forecast.
+HEAVY_MODULES = ('numpy', 'pandas', 'scipy', 'sklearn')
+
+# Run in a fresh interpreter: boot the WSGI application, load the URLconf
+# (and so every view module) as the first request would, then fit one
+# forecast to see what the prediction stack costs when it is needed.
+PROBE = '''
+import json, resource, sys, time
+
+def rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+start = time.perf_counter()
+import {module}
+from django.urls import get_resolver
+get_resolver().url_patterns
+boot = time.perf_counter() - start
+boot_rss = rss_mb()
+loaded = sorted(name for name in {heavy!r} if name in sys.modules)
+
+from core.predictor import fit_series
+start = time.perf_counter()
+fit_series([3, 5, 4, 6, 7])
+forecast = time.perf_counter() - start
+print(json.dumps({{
+    'boot_ms': boot * 1000, 'boot_rss_mb': boot_rss, 'loaded': loaded,
+    'forecast_ms': forecast * 1000, 'forecast_rss_mb': rss_mb(),
+}}))
+'''
+
+
+def probe(module='hospital_system.wsgi'):
+    """Boot ``module`` in a new interpreter and return its timings and memory."""
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'hospital_system.settings'))
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+class Command(BaseCommand):
+    help = 'Measures worker boot time and memory, and what the prediction stack adds on first use'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to boot')
+        parser.add_argument('--module', default='hospital_system.wsgi', help='Module that boots a worker')
+
+    def handle(self, *args, **options):
+        runs = [probe(options['module']) for _ in range(options['runs'])]
+
+        def median(key):
+            return statistics.median(run[key] for run in runs)
+
+        self.stdout.write(
+            f"boot            {median('boot_ms'):8.1f} ms  {median('boot_rss_mb'):6.1f} MB RSS  (median of {len(runs)})"
+        )
+        self.stdout.write(
+            f"first forecast  {median('forecast_ms'):8.1f} ms  {median('forecast_rss_mb'):6.1f} MB RSS after"
+        )
+        loaded = sorted({name for run in runs for name in run['loaded']})
+        if loaded:
+            raise CommandError(f"Booting {options['module']} imported {', '.join(loaded)}")
+        self.stdout.write(self.style.SUCCESS(f"No prediction modules loaded at boot ({', '.join(HEAVY_MODULES)})."))
@@ -0,0 +1,231 @@
+import json
+import time
+from collections import namedtuple
+from datetime import date
+from pathlib import Path
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+
+from core import beds, census, lookup, search
+from core.bench import (
+    format_summary, isolated_database, seed_appointments, seed_patients, seed_records, seed_staff, summarize,
+)
+from core.metrics import QueryRecorder
+from core.models import Appointment, InpatientRecord, OutpatientRecord, PatientProfile, StaffProfile, User
+
+BASELINE = Path(__file__).resolve().parents[2] / 'data' / 'bench_views_baseline.json'
+
+# How each route is exercised: who asks, with which method, and the URL
+# arguments, query string and form data. ``kwargs`` may be a function of the
+# seeded context, called before every request (e.g. to make a record to delete).
+Scenario = namedtuple('Scenario', ['user', 'method', 'kwargs', 'query', 'data'], defaults=('get', {}, '', None))
+
+
+def _new_outpatient(ctx):
+    record = OutpatientRecord.objects.create(
+        patient_id=ctx['patient'], created_by_id=ctx['staff'], visit_date=date.today(),
+        symptoms='Cough', diagnosis='Cold', prescription='Rest',
+    )
+    return {'id': record.pk}
+
+
+def _new_inpatient(ctx):
+    record = InpatientRecord.objects.create(
+        patient_id=ctx['patient'], created_by_id=ctx['staff'], bed_number=1, case_type='General',
+        admitted_date=date.today(), discharged_date=date.today(), treatment_plan='Rest',
+    )
+    return {'id': record.pk}
+
+
+SCENARIOS = {
+    'home': Scenario(None),
+    'patient_register': Scenario(None),
+    'login': Scenario(None),
+    'register_staff': Scenario('admin'),
+    'patient_home': Scenario('patient'),
+    'staff_dashboard': Scenario('staff'),
+    'add_patient_record': Scenario('staff', query='?admission_number={admission_number}'),
+    'add_inpatient': Scenario('staff', kwargs=lambda ctx: {'patient_id': ctx['patient']}),
+    'add_outpatient': Scenario('staff', kwargs=lambda ctx: {'patient_id': ctx['patient']}),
+    'patient_records': Scenario('staff', query='?admission_number={admission_number}'),
+    'edit_outpatient': Scenario('staff', kwargs=lambda ctx: {'id': ctx['outpatient']}),
+    'delete_outpatient': Scenario('staff', kwargs=_new_outpatient),
+    'edit_inpatient': Scenario('staff', kwargs=lambda ctx: {'id': ctx['inpatient']}),
+    'delete_inpatient': Scenario('staff', kwargs=_new_inpatient),
+    'today_appointments': Scenario('staff'),
+    'queue_stream': Scenario('staff'),
+    'call_appointment': Scenario('staff', 'post', lambda ctx: {'id': ctx['appointment']}),
+    'complete_appointment': Scenario('staff', 'post', lambda ctx: {'id': ctx['appointment']}),
+    'records_api': Scenario('staff', kwargs={'kind': 'outpatients'}),
+    'export_records': Scenario('staff', kwargs={'kind': 'outpatients'}, query='?start={today}&end={today}'),
+    'search_records': Scenario('staff', query='?q=fever'),
+    'patient_lookup': Scenario('staff', query='?q=patient+1'),
+    'metrics': Scenario('admin'),
+    'metrics_panel': Scenario('admin'),
+    'admin_dashboard': Scenario('admin'),
+    'dashboard_stats': Scenario('admin'),
+}
+
+
+def routes(patterns=None, skip_namespaces=('admin',)):
+    """Names of every named URL pattern, outside the Django admin."""
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace not in skip_namespaces:
+                yield from routes(pattern.url_patterns, skip_namespaces)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield pattern.name
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks latency and query counts of every view against a stored baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=5000)
+        parser.add_argument('--appointments', type=int, default=10000,
+                            help='Spread over the last 30 days')
+        parser.add_argument('--inpatients', type=int, default=5000)
+        parser.add_argument('--outpatients', type=int, default=20000)
+        parser.add_argument('--repeat', type=int, default=20, help='Timed requests per route')
+        parser.add_argument('--baseline', default=str(BASELINE), help='Baseline JSON to compare against')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Write this run as the new baseline instead of comparing')
+        parser.add_argument('--compare-latency', action='store_true',
+                            help='Also fail on slower medians; only meaningful on the machine that saved the baseline')
+        parser.add_argument('--latency-tolerance', type=float, default=0.5,
+                            help='Allowed median latency growth over the baseline, as a fraction')
+        parser.add_argument('--latency-floor-ms', type=float, default=5.0,
+                            help='Median growth below this many ms is never a regression')
+
+    def handle(self, *args, **options):
+        names = list(routes())
+        missing = [name for name in names if name not in SCENARIOS]
+        if missing:
+            raise CommandError(f"No scenario for {', '.join(missing)}; add them to SCENARIOS.")
+
+        scale = {key: options[key] for key in ('patients', 'appointments', 'inpatients', 'outpatients')}
+        with isolated_database():
+            start = time.perf_counter()
+            ctx = self.seed(scale)
+            self.stdout.write(f"Seeded {scale} in {time.perf_counter() - start:.1f}s")
+            results = {name: self.measure(name, SCENARIOS[name], ctx, options['repeat']) for name in names}
+
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<22} {result['status']}  queries {result['cold_queries']:>3} cold "
+                f"{result['queries']:>3} warm  {format_summary(result['latency'])}"
+            )
+
+        runs = {
+            name: {
+                'status': r['status'], 'cold_queries': r['cold_queries'], 'queries': r['queries'],
+                'p50_ms': round(r['latency']['p50'], 3), 'p95_ms': round(r['latency']['p95'], 3),
+            }
+            for name, r in results.items()
+        }
+        if options['save_baseline']:
+            with open(options['baseline'], 'w') as f:
+                json.dump({'scale': scale, 'routes': runs}, f, indent=2, sort_keys=True)
+                f.write('\n')
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {options['baseline']}"))
+            return
+        self.compare(runs, scale, options)
+
+    def seed(self, scale):
+        seed_patients(scale['patients'])
+        patients = list(PatientProfile.objects.order_by('pk').values_list('pk', flat=True))
+        staff = [profile.pk for profile in seed_staff(20)]
+        seed_appointments(patients, scale['appointments'])
+        seed_records(patients, staff, scale['inpatients'], scale['outpatients'])
+        census.rebuild()
+        beds.rebuild()
+        search.rebuild()
+        lookup.rebuild()
+
+        User.objects.create_superuser('9000000000', password='bench-password')
+        patient = PatientProfile.objects.select_related('user').get(pk=patients[0])
+        today = date.today()
+        return {
+            'admin_user': User.objects.get(mobile='9000000000'),
+            'staff_user': StaffProfile.objects.select_related('user').get(pk=staff[0]).user,
+            'patient_user': patient.user,
+            'patient': patient.pk,
+            'staff': staff[0],
+            'admission_number': patient.admission_number,
+            'inpatient': InpatientRecord.objects.values_list('pk', flat=True).first(),
+            'outpatient': OutpatientRecord.objects.values_list('pk', flat=True).first(),
+            'appointment': Appointment.objects.filter(appointment_date=today).values_list('pk', flat=True).first(),
+            'today': today.isoformat(),
+        }
+
+    def client_for(self, role, ctx):
+        # DEBUG allows localhost without ALLOWED_HOSTS; the test runner's 'testserver' is not set up here.
+        client = Client(HTTP_HOST='localhost')
+        if role:
+            client.force_login(ctx[f'{role}_user'])
+        return client
+
+    def request(self, scenario, name, ctx, client):
+        kwargs = scenario.kwargs(ctx) if callable(scenario.kwargs) else scenario.kwargs
+        url = reverse(name, kwargs=kwargs) + scenario.query.format(**ctx)
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = getattr(client, scenario.method)(url, scenario.data)
+            if response.streaming and not response.is_async:
+                b''.join(response.streaming_content)
+        elapsed = (time.perf_counter() - start) * 1000
+        response.close()
+        return response.status_code, recorder.count, elapsed
+
+    def measure(self, name, scenario, ctx, repeat):
+        client = self.client_for(scenario.user, ctx)
+        # The first request runs with empty caches; the rest show the steady state.
+        for cache in caches.all():
+            cache.clear()
+        status, cold_queries, _ = self.request(scenario, name, ctx, client)
+        queries, latencies = 0, []
+        for _ in range(repeat):
+            status, count, elapsed = self.request(scenario, name, ctx, client)
+            queries = max(queries, count)
+            latencies.append(elapsed)
+        return {'status': status, 'cold_queries': cold_queries, 'queries': queries, 'latency': summarize(latencies)}
+
+    def compare(self, runs, scale, options):
+        try:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            raise CommandError(f"No baseline at {options['baseline']}; run with --save-baseline first.")
+        # Statuses and query counts hold on any machine; latency only on the one that saved the baseline.
+        compare_latency = options['compare_latency']
+        if compare_latency and baseline.get('scale') != scale:
+            compare_latency = False
+            self.stdout.write(self.style.WARNING(
+                f"Baseline was recorded at {baseline.get('scale')}; comparing query counts only."
+            ))
+
+        regressions = []
+        for name, run in runs.items():
+            base = baseline['routes'].get(name)
+            if base is None:
+                self.stdout.write(self.style.WARNING(f'{name} is not in the baseline'))
+                continue
+            if run['status'] != base['status']:
+                regressions.append(f"{name}: status {base['status']} -> {run['status']}")
+            for key in ('cold_queries', 'queries'):
+                if run[key] > base[key]:
+                    regressions.append(f"{name}: {key.replace('_', ' ')} {base[key]} -> {run[key]}")
+            # The tail of a few dozen samples is too noisy to gate on; the median is not.
+            limit = max(base['p50_ms'] * (1 + options['latency_tolerance']),
+                        base['p50_ms'] + options['latency_floor_ms'])
+            if compare_latency and run['p50_ms'] > limit:
+                regressions.append(f"{name}: p50 {base['p50_ms']:.1f}ms -> {run['p50_ms']:.1f}ms")
+
+        if regressions:
+            raise CommandError('Regressions against the baseline:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS(f'No regressions against {len(baseline["routes"])} baseline routes.'))
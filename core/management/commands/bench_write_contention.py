@@ -0,0 +1,87 @@
+import threading
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+from core.bench import format_summary, isolated_database, seed_patients, summarize
+from core.models import Appointment, PatientProfile
+from core.tokens import dispense_token
+from core.writer import SingleWriter
+from hospital_system.sqlite import database_settings
+
+
+def book(patient_id, day, n):
+    Appointment.objects.create(
+        patient_id=patient_id, appointment_date=day, symptom_or_disease='Fever',
+        admission_number=f'BENCH{n}', token_number=dispense_token(day, n % 4 == 0),
+    )
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks concurrent bookings under each SQLite profile, with and without the single writer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=32, help='Concurrent writers')
+        parser.add_argument('--writes', type=int, default=50, help='Bookings per thread')
+        parser.add_argument('--timeout', type=float, default=5,
+                            help='SQLite busy timeout in seconds for the run')
+
+    def handle(self, *args, **options):
+        with isolated_database():
+            seed_patients(options['threads'])
+            self.patients = list(PatientProfile.objects.values_list('pk', flat=True))
+            # WAL is a persistent property of the file, so the stock profile runs first.
+            for profile in ('default', 'production'):
+                for serialized in (False, True):
+                    self.measure(profile, serialized, options)
+
+    def configure(self, profile, timeout):
+        for conn in connections.all():
+            conn.close()
+        connections.settings['default'].update(database_settings(profile, timeout=timeout))
+        connections['default'].settings_dict.update(database_settings(profile, timeout=timeout))
+
+    def measure(self, profile, serialized, options):
+        self.configure(profile, options['timeout'])
+        Appointment.objects.all().delete()
+        day = date(2030, 1, 1 + len(self.patients) % 28)
+        latencies, errors = [], []
+        # A fresh writer, so its connection is opened with this profile.
+        single = SingleWriter() if serialized else None
+        barrier = threading.Barrier(options['threads'])
+
+        def worker(i):
+            try:
+                barrier.wait()
+                for j in range(options['writes']):
+                    n = i * options['writes'] + j
+                    start = time.perf_counter()
+                    try:
+                        if single:
+                            single.submit(book, self.patients[i], day, n).result()
+                        else:
+                            with transaction.atomic():
+                                book(self.patients[i], day, n)
+                    except OperationalError as exc:
+                        errors.append(exc)
+                    else:
+                        latencies.append((time.perf_counter() - start) * 1000)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['threads'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        label = f"{profile:<10} {'single writer' if serialized else 'direct':<13}"
+        rate = len(latencies) / elapsed
+        line = f"{label} {rate:8.0f} writes/s  {len(errors)} lock errors"
+        if latencies:
+            line += f"  {format_summary(summarize(latencies))}"
+        self.stdout.write(line)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import versions
+from core.models import Appointment
+
+
+class Command(BaseCommand):
+    help = 'Marks all appointments from previous days as Completed (run daily)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report how many appointments would be expired')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        if options['dry_run']:
+            count = Appointment.objects.past_due(today).count()
+            self.stdout.write(self.style.SUCCESS(f'Dry run: {count} appointments would be expired.'))
+            return
+        count = Appointment.objects.expire(today)
+        if count:
+            versions.bump('appointments')  # a bulk update skips the signals
+        self.stdout.write(self.style.SUCCESS(f'Expired {count} appointments.'))
@@ -0,0 +1,172 @@
+import csv
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from core import dashboard, lookup, versions
+from core.forms import PatientRegisterForm
+from core.models import PatientProfile, User
+from core.sequences import allocate_admission_numbers
+
+
+class ImportPatientForm(PatientRegisterForm):
+    """The registration rules, minus the per-row uniqueness queries.
+
+    Uniqueness of Aadhaar and mobile numbers is checked once per batch by the
+    command instead.
+    """
+
+    def validate_unique(self):
+        pass
+
+
+def read_rows(path, fmt):
+    """Yield ``(line_number, row)`` lazily from a CSV or JSON Lines file."""
+    with open(path, newline='', encoding='utf-8-sig') as source:
+        if fmt == 'csv':
+            reader = csv.DictReader(source)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_number, line in enumerate(source, start=1):
+                if line.strip():
+                    try:
+                        yield line_number, json.loads(line)
+                    except ValueError as exc:
+                        yield line_number, exc
+
+
+def _init_worker():
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = 'Bulk-imports patients (user + profile) from a CSV or JSON Lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='Input format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows validated, hashed and inserted per transaction')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Processes used to hash passwords (0 hashes in this process)')
+        parser.add_argument('--rejects', help='Write rejected rows and reasons to this CSV file')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or ('jsonl' if options['path'].endswith(('.jsonl', '.ndjson')) else 'csv')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        self.imported = self.rejected = 0
+        self.reject_writer = None
+        rejects_file = open(options['rejects'], 'w', newline='') if options['rejects'] else None
+        if rejects_file:
+            self.reject_writer = csv.writer(rejects_file)
+            self.reject_writer.writerow(['line', 'reason', 'row'])
+
+        executor = None
+        if options['workers'] != 0:
+            executor = ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker)
+
+        started = time.perf_counter()
+        try:
+            rows = read_rows(options['path'], fmt)
+            while batch := list(islice(rows, options['batch_size'])):
+                self.import_batch(batch, executor)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'{self.imported} imported, {self.rejected} rejected '
+                    f'({self.imported / elapsed:.0f} rows/s)'
+                )
+        except OSError as exc:
+            raise CommandError(exc)
+        finally:
+            if executor:
+                executor.shutdown()
+            if rejects_file:
+                rejects_file.close()
+            if self.imported:
+                # bulk_create skipped the signals that keep these current.
+                dashboard.invalidate()
+                versions.bump('patients')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {self.imported} patients, rejected {self.rejected} rows '
+            f'in {elapsed:.1f}s ({self.imported / elapsed if elapsed else 0:.0f} rows/s).'
+        ))
+
+    def reject(self, line, reason, row):
+        self.rejected += 1
+        if self.reject_writer:
+            self.reject_writer.writerow([line, reason, json.dumps(row, default=str)])
+
+    def import_batch(self, batch, executor):
+        valid = []
+        for line, row in batch:
+            if isinstance(row, Exception):
+                self.reject(line, f'invalid JSON: {row}', None)
+                continue
+            form = ImportPatientForm(data=row)
+            if not form.is_valid():
+                errors = '; '.join(f'{field}: {" ".join(msgs)}' for field, msgs in form.errors.items())
+                self.reject(line, errors, row)
+                continue
+            valid.append((line, row, form.cleaned_data))
+
+        valid = self.drop_duplicates(valid)
+        if not valid:
+            return
+
+        passwords = [row.get('password') or data['date_of_birth'].strftime('%d%m%Y') for _, row, data in valid]
+        if executor:
+            hashes = list(executor.map(make_password, passwords, chunksize=max(1, len(passwords) // 32)))
+        else:
+            hashes = [make_password(password) for password in passwords]
+
+        try:
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(mobile=data['contact'], role='patient', password=hashed)
+                    for (_, _, data), hashed in zip(valid, hashes)
+                ])
+                numbers = allocate_admission_numbers(len(valid))
+                profiles = PatientProfile.objects.bulk_create([
+                    PatientProfile(user=user, admission_number=number, **data)
+                    for (_, _, data), user, number in zip(valid, users, numbers)
+                ])
+                # bulk_create skips the post_save signal that normally keeps these.
+                lookup.index_patients(profiles)
+        except IntegrityError as exc:
+            # Lost a race with another registration; nothing in this batch was saved.
+            for line, row, _ in valid:
+                self.reject(line, f'batch rolled back: {exc}', row)
+            return
+        self.imported += len(valid)
+
+    def drop_duplicates(self, valid):
+        """Reject rows whose mobile or Aadhaar number is taken, in the DB or earlier in the file."""
+        mobiles = [data['contact'] for _, _, data in valid]
+        aadhaars = [data['aadhaar_number'] for _, _, data in valid]
+        taken_mobiles = set(User.objects.filter(mobile__in=mobiles).values_list('mobile', flat=True))
+        taken_aadhaars = set(
+            PatientProfile.objects.filter(aadhaar_number__in=aadhaars).values_list('aadhaar_number', flat=True)
+        )
+        kept = []
+        for line, row, data in valid:
+            if data['contact'] in taken_mobiles:
+                self.reject(line, 'contact: mobile number already registered', row)
+            elif data['aadhaar_number'] in taken_aadhaars:
+                self.reject(line, 'aadhaar_number: already registered', row)
+            else:
+                taken_mobiles.add(data['contact'])
+                taken_aadhaars.add(data['aadhaar_number'])
+                kept.append((line, row, data))
+        return kept
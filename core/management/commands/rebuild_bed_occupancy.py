@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core import beds
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds bed assignments and ward occupancy counters from open inpatient records'
+
+    def handle(self, *args, **options):
+        occupied = beds.rebuild()
+        counts = beds.occupancy()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt bed occupancy: {occupied} of {counts['total']} beds occupied."
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core import census
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the daily census rollup from inpatient and outpatient records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of census rows per bulk insert')
+
+    def handle(self, *args, **options):
+        days = census.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt census for {days} days.'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core import lookup
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the typeahead lookup keys for every patient'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Patients read per batch')
+
+    def handle(self, *args, **options):
+        count = lookup.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {count} lookup keys.'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index from appointments and clinical records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Documents indexed per batch')
+
+    def handle(self, *args, **options):
+        count = search.rebuild(batch_size=options['batch_size'])
+        backend = search.get_backend().name
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} documents ({backend}).'))
@@ -1,19 +1,81 @@
-from django.core.management.base import BaseCommand
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from django.utils import timezone
-from datetime import timedelta
+
+from core import versions
 from core.models import Appointment
+from core.tokens import purge_dispensers
+
 
 class Command(BaseCommand):
     help = 'Resets the token numbers for appointments daily'
 
-    def handle(self, *args, **kwargs):
-        today = timezone.now().date()
-        appointments = Appointment.objects.filter(token_reset_date__lt=today)
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Reset appointments on this day (YYYY-MM-DD; default: yesterday)')
+        parser.add_argument('--all', action='store_true',
+                            help='Reset every past day that still has unreset tokens, e.g. after missed runs')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Appointments updated per transaction')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would be reset without writing')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        now = timezone.now()
+        today = timezone.localdate(now)
+
+        # Past appointments whose token was never reset. A reset stamps
+        # token_reset_date, so rows drop out of this filter for good and
+        # re-running the job, on any day, is a no-op.
+        stale = Appointment.objects.filter(appointment_date__lt=today, token_reset_date__isnull=True)
+        if options['all']:
+            days = stale.order_by('appointment_date').values_list('appointment_date', flat=True).distinct()
+        elif options['date']:
+            try:
+                days = [datetime.strptime(options['date'], '%Y-%m-%d').date()]
+            except ValueError:
+                raise CommandError('--date must be in YYYY-MM-DD format')
+        else:
+            days = [today - timedelta(days=1)]
+
+        total = 0
+        for day in days:
+            partition = stale.filter(appointment_date=day)
+            if options['dry_run']:
+                count = partition.count()
+                self.stdout.write(f'{day}: would reset {count} appointments')
+            else:
+                count = self.reset_partition(partition, batch_size, now)
+                self.stdout.write(f'{day}: reset {count} appointments')
+            total += count
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Dry run: {total} appointments would be reset.'))
+            return
+        if total:
+            versions.bump('appointments')  # the batched updates skip the signals
 
-        for appointment in appointments:
-            # Ensure token_number is set to a valid value (e.g., 0 or any other number)
-            appointment.token_number = 0  # Set the token number to 0 or another default value
-            appointment.token_reset_date = today
-            appointment.save()
+        purged = purge_dispensers(today)
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully reset the tokens ({total} appointments, {purged} expired dispensers).'
+        ))
 
-        self.stdout.write(self.style.SUCCESS('Successfully reset the tokens.'))
+    def reset_partition(self, partition, batch_size, now):
+        """Reset one day's appointments in primary-key order, one batch per transaction."""
+        partition = partition.order_by('pk')
+        last_pk = 0
+        count = 0
+        while True:
+            ids = list(partition.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return count
+            with transaction.atomic():
+                count += Appointment.objects.filter(pk__in=ids).update(
+                    token_number=0, token_reset_date=now
+                )
+            last_pk = ids[-1]
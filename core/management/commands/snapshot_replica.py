@@ -0,0 +1,55 @@
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def snapshot(source, target):
+    """Copy the SQLite database ``source`` to ``target`` without blocking writers for long.
+
+    The copy is written beside the target and swapped in with a rename, so
+    readers always open either the old snapshot or the new one.
+    """
+    partial = f'{target}.partial'
+    if os.path.exists(partial):
+        os.remove(partial)
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(partial)
+    try:
+        # Copy in steps so each step holds the read lock only briefly.
+        src.backup(dst, pages=1024)
+        # Readers open the snapshot read-only, which needs a rollback journal.
+        dst.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        dst.close()
+        src.close()
+    os.replace(partial, target)
+
+
+class Command(BaseCommand):
+    help = 'Copies the primary SQLite database to the read replica used by reporting views'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Snapshot path (default: HMS_REPLICA_PATH)')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep refreshing every N seconds instead of copying once')
+
+    def handle(self, *args, **options):
+        target = options['output'] or getattr(settings, 'HMS_REPLICA_PATH', None)
+        if not target:
+            raise CommandError('Set HMS_REPLICA_PATH or pass --output.')
+        primary = connections[DEFAULT_DB_ALIAS].settings_dict
+        if primary['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('Snapshots are only for SQLite; point the replica alias at a real replica instead.')
+
+        while True:
+            start = time.perf_counter()
+            snapshot(str(primary['NAME']), target)
+            elapsed = (time.perf_counter() - start) * 1000
+            self.stdout.write(self.style.SUCCESS(f'Snapshot written to {target} in {elapsed:.0f} ms.'))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
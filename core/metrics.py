@@ -0,0 +1,374 @@
+"""Per-view request metrics and sampled profiles.
+
+``MetricsMiddleware`` times every request. For the view that served it, it
+records a latency histogram, the number of SQL queries and their total
+time, and the response size. A statement run ``HMS_DUPLICATE_QUERY_THRESHOLD``
+or more times in one request usually means a lookup inside a loop (N+1). It
+is counted against the view and logged to ``core.metrics`` with the SQL.
+
+The numbers are kept per process and served by the ``metrics`` view in the
+Prometheus text format. Set ``HMS_PROFILE_SAMPLE_RATE`` to profile a share of
+requests with cProfile, or pyinstrument if installed and chosen with
+``HMS_PROFILER``. The latest ``HMS_PROFILE_KEEP`` reports are shown in the
+metrics panel.
+
+Queries go to the recorder of the request whose context they run in. Under
+ASGI a sync view runs in a worker thread with its own database connection,
+so every connection carries a wrapper that looks the recorder up in a
+context variable, which ``sync_to_async`` carries into that thread.
+"""
+import cProfile
+import io
+import logging
+import pstats
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+TRANSACTION_STATEMENTS = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE', 'END')
+
+
+class Histogram:
+    """Counts of observations at or below each bucket bound, plus an overflow."""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self):
+        """``(bound, count)`` pairs as Prometheus buckets, ending with ``+Inf``."""
+        running = 0
+        for bound, count in zip(self.bounds + ('+Inf',), self.counts):
+            running += count
+            yield bound, running
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the ``p``-th percentile (None past the last)."""
+        if not self.count:
+            return None
+        rank = p / 100 * self.count
+        for bound, running in self.cumulative():
+            if running >= rank:
+                return None if bound == '+Inf' else bound
+
+
+class ViewStats:
+    def __init__(self):
+        self.responses = Counter()
+        self.latency = Histogram(LATENCY_BUCKETS_MS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.query_ms = 0.0
+        self.response_bytes = 0
+        self.duplicate_requests = 0
+        self.last_duplicate = None
+
+    @property
+    def requests(self):
+        return self.latency.count
+
+
+class Registry:
+    def __init__(self):
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def record(self, view, method, status, elapsed_ms, recorder, size, duplicates):
+        with self._lock:
+            stats = self._views.setdefault(view, ViewStats())
+            stats.responses[(method, status)] += 1
+            stats.latency.observe(elapsed_ms)
+            stats.queries.observe(recorder.count)
+            stats.query_ms += recorder.elapsed_ms
+            stats.response_bytes += size or 0
+            if duplicates:
+                stats.duplicate_requests += 1
+                stats.last_duplicate = duplicates[0]
+
+    def add_bytes(self, view, size):
+        with self._lock:
+            self._views.setdefault(view, ViewStats()).response_bytes += size
+
+    def views(self):
+        with self._lock:
+            return sorted(self._views.items())
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+registry = Registry()
+profiles = deque(maxlen=getattr(settings, 'HMS_PROFILE_KEEP', 20))
+
+
+class QueryRecorder:
+    """``execute_wrapper`` that counts and times statements, grouped by SQL text."""
+
+    def __init__(self):
+        self.count = 0
+        self.elapsed_ms = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.elapsed_ms += (time.perf_counter() - start) * 1000
+            self.count += 1
+            self.statements[sql] += 1
+
+    def duplicates(self, threshold):
+        """``(sql, times)`` for statements run at least ``threshold`` times, most first.
+
+        Transaction control (BEGIN, SAVEPOINT, ...) repeats whenever a request
+        makes several writes, and is not a lookup in a loop.
+        """
+        return [
+            (sql, n) for sql, n in self.statements.most_common()
+            if n >= threshold and not sql.lstrip().upper().startswith(TRANSACTION_STATEMENTS)
+        ]
+
+
+_recorder = ContextVar('query_recorder', default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def record_queries_on(sender, connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def pyinstrument_available():
+    try:
+        import pyinstrument  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def start_profiler():
+    """Start profiling this thread; returns a function that stops it and returns the report.
+
+    Returns None if another profiler is already running.
+    """
+    if getattr(settings, 'HMS_PROFILER', 'cprofile') == 'pyinstrument' and pyinstrument_available():
+        from pyinstrument import Profiler
+
+        profiler = Profiler()
+        try:
+            profiler.start()
+        except RuntimeError:
+            return None
+
+        def stop():
+            profiler.stop()
+            return profiler.output_text()
+        return stop
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return None
+
+    def stop():
+        profiler.disable()
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(40)
+        return report.getvalue()
+    return stop
+
+
+def sampled():
+    rate = getattr(settings, 'HMS_PROFILE_SAMPLE_RATE', 0)
+    return rate > 0 and random.random() < rate
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unmatched'
+
+
+def _counted(content, view):
+    size = 0
+    try:
+        for chunk in content:
+            size += len(chunk)
+            yield chunk
+    finally:
+        registry.add_bytes(view, size)
+
+
+async def _acounted(content, view):
+    size = 0
+    try:
+        async for chunk in content:
+            size += len(chunk)
+            yield chunk
+    finally:
+        registry.add_bytes(view, size)
+
+
+class Measurement:
+    """The queries, wall time and optional profile of one request."""
+
+    def __init__(self):
+        self.recorder = QueryRecorder()
+        self.elapsed_ms = 0.0
+        self.report = None
+
+    @contextmanager
+    def running(self):
+        # Connections opened before this module was imported missed the signal.
+        for conn in connections.all(initialized_only=True):
+            record_queries_on(None, conn)
+        stop_profiler = start_profiler() if sampled() else None
+        start = time.perf_counter()
+        token = _recorder.set(self.recorder)
+        try:
+            yield self
+        finally:
+            _recorder.reset(token)
+            self.report = stop_profiler() if stop_profiler else None
+            self.elapsed_ms = (time.perf_counter() - start) * 1000
+
+
+class MetricsMiddleware:
+    """Record latency, queries and response size per view. Disable with ``HMS_METRICS_ENABLED``.
+
+    Works in both sync and async stacks, so an ASGI request is not handed to
+    a thread just for this middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'HMS_METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with Measurement().running() as measurement:
+            response = self.get_response(request)
+        return self.record(request, response, measurement)
+
+    async def __acall__(self, request):
+        with Measurement().running() as measurement:
+            response = await self.get_response(request)
+        return self.record(request, response, measurement)
+
+    def record(self, request, response, measurement):
+        recorder, elapsed_ms, report = measurement.recorder, measurement.elapsed_ms, measurement.report
+        view = view_name(request)
+        threshold = getattr(settings, 'HMS_DUPLICATE_QUERY_THRESHOLD', 3)
+        duplicates = recorder.duplicates(threshold)
+        if duplicates:
+            sql, times = duplicates[0]
+            logger.warning('%s ran the same query %d times: %s', view, times, sql)
+
+        size = None
+        if not response.streaming:
+            size = len(response.content)
+        else:
+            # Queries made while streaming are not counted; the size is, once sent.
+            counted = _acounted if response.is_async else _counted
+            response.streaming_content = counted(response.streaming_content, view)
+        registry.record(view, request.method, response.status_code, elapsed_ms, recorder, size, duplicates)
+
+        if report is not None:
+            profiles.appendleft({
+                'time': time.time(), 'view': view, 'method': request.method,
+                'path': request.get_full_path(), 'elapsed_ms': elapsed_ms,
+                'queries': recorder.count, 'report': report,
+            })
+        response['Server-Timing'] = (
+            f'db;dur={recorder.elapsed_ms:.1f};desc="{recorder.count} queries", '
+            f'total;dur={elapsed_ms:.1f}'
+        )
+        return response
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text():
+    """Every view's metrics in the Prometheus text exposition format."""
+    lines = [
+        '# TYPE hms_requests_total counter',
+        '# TYPE hms_request_duration_ms histogram',
+        '# TYPE hms_request_queries histogram',
+        '# TYPE hms_request_query_ms_total counter',
+        '# TYPE hms_response_bytes_total counter',
+        '# TYPE hms_duplicate_query_requests_total counter',
+    ]
+    for view, stats in registry.views():
+        v = f'view="{_label(view)}"'
+        for (method, status), count in sorted(stats.responses.items()):
+            lines.append(f'hms_requests_total{{{v},method="{method}",status="{status}"}} {count}')
+        for name, histogram in (('hms_request_duration_ms', stats.latency), ('hms_request_queries', stats.queries)):
+            for bound, count in histogram.cumulative():
+                lines.append(f'{name}_bucket{{{v},le="{bound}"}} {count}')
+            lines.append(f'{name}_sum{{{v}}} {histogram.total:.3f}')
+            lines.append(f'{name}_count{{{v}}} {histogram.count}')
+        lines.append(f'hms_request_query_ms_total{{{v}}} {stats.query_ms:.3f}')
+        lines.append(f'hms_response_bytes_total{{{v}}} {stats.response_bytes}')
+        lines.append(f'hms_duplicate_query_requests_total{{{v}}} {stats.duplicate_requests}')
+    return '\n'.join(lines) + '\n'
+
+
+def summary():
+    """One row per view for the metrics panel, slowest p95 first."""
+    rows = []
+    for view, stats in registry.views():
+        n = stats.requests
+        rows.append({
+            'view': view,
+            'requests': n,
+            'mean_ms': stats.latency.total / n if n else 0,
+            'p95_ms': stats.latency.percentile(95),
+            'mean_queries': stats.queries.total / n if n else 0,
+            'mean_query_ms': stats.query_ms / n if n else 0,
+            'mean_bytes': stats.response_bytes / n if n else 0,
+            'duplicate_requests': stats.duplicate_requests,
+            'last_duplicate': stats.last_duplicate,
+        })
+    # A p95 of None is past the last bucket, so slower than any bound.
+    rows.sort(key=lambda row: (row['p95_ms'] is None, row['p95_ms'] or 0, row['mean_ms']), reverse=True)
+    return rows
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_dailycensus'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdmissionSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hospital_code', models.CharField(max_length=10)),
+                ('year', models.IntegerField()),
+                ('last_serial', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('hospital_code', 'year')},
+            },
+        ),
+    ]
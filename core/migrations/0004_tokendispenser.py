@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_admissionsequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenDispenser',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('queue', models.CharField(choices=[('priority', 'Priority'), ('normal', 'Normal')], max_length=10)),
+                ('last_token', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('day', 'queue')},
+            },
+        ),
+    ]
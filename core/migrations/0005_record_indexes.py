@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_tokendispenser'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['appointment_date', 'token_number'], name='appt_date_token_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', 'appointment_date'], name='appt_patient_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inpatientrecord',
+            index=models.Index(fields=['patient', 'created_by', 'admitted_date'], name='inpat_patient_staff_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inpatientrecord',
+            index=models.Index(fields=['admitted_date'], name='inpat_admitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inpatientrecord',
+            index=models.Index(condition=models.Q(('discharged_date__isnull', True)), fields=['bed_number'], name='inpat_open_bed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outpatientrecord',
+            index=models.Index(fields=['patient', 'created_by', 'visit_date'], name='outpat_patient_staff_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outpatientrecord',
+            index=models.Index(fields=['visit_date'], name='outpat_visit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='staffprofile',
+            index=models.Index(fields=['role'], name='staff_role_idx'),
+        ),
+    ]
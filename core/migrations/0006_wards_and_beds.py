@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_record_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ward',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('capacity', models.IntegerField(default=0)),
+                ('occupied', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Bed',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.IntegerField(unique=True)),
+                ('occupant', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bed', to='core.inpatientrecord')),
+                ('ward', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='beds', to='core.ward')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('occupant__isnull', True)), fields=['ward', 'number'], name='bed_free_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_wards_and_beds'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='appointment',
+            name='status',
+            field=models.CharField(choices=[('Booked', 'Booked'), ('Called', 'Called'), ('Completed', 'Completed')], default='Booked', max_length=10),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:06
+
+from django.db import OperationalError, migrations, models
+
+
+def create_fts_table(apps, schema_editor):
+    # SQLite builds without FTS5 fall back to the SearchPosting table.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE core_search_fts USING fts5(body, tokenize='porter unicode61 remove_diacritics 2')"
+        )
+    except OperationalError:
+        pass
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS core_search_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_appointment_called_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('kind', models.PositiveSmallIntegerField(choices=[(1, 'Outpatient record'), (2, 'Inpatient record'), (3, 'Appointment')])),
+                ('object_id', models.IntegerField()),
+                ('weight', models.IntegerField(default=1)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'kind', 'object_id'], name='search_term_idx'), models.Index(fields=['kind', 'object_id'], name='search_document_idx')],
+            },
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:11
+
+import unicodedata
+from itertools import islice
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The key derivation of core.lookup as of this migration, copied so later
+# changes to that module cannot change what this migration writes.
+NAME, CONTACT, AADHAAR, ADMISSION = 1, 2, 3, 4
+KEY_LENGTH = 100
+BATCH_SIZE = 1000
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c if c.isalnum() else ' ' for c in text if not unicodedata.combining(c))
+    return ' '.join(text.lower().split())
+
+
+def digits(text):
+    return ''.join(c for c in text or '' if c.isdigit())
+
+
+def patient_keys(name, contact, aadhaar_number, admission_number):
+    keys = set()
+    words = normalize(name).split()
+    for i in range(len(words)):
+        keys.add((NAME, ' '.join(words[i:])[:KEY_LENGTH]))
+    for field, value in ((CONTACT, digits(contact)), (AADHAAR, digits(aadhaar_number)),
+                         (ADMISSION, normalize(admission_number).replace(' ', ''))):
+        if value:
+            keys.add((field, value[:KEY_LENGTH]))
+    return keys
+
+
+def index_existing_patients(apps, schema_editor):
+    PatientProfile = apps.get_model('core', 'PatientProfile')
+    PatientLookupKey = apps.get_model('core', 'PatientLookupKey')
+    patients = PatientProfile.objects.values_list(
+        'pk', 'name', 'contact', 'aadhaar_number', 'admission_number'
+    ).iterator(chunk_size=BATCH_SIZE)
+    while batch := list(islice(patients, BATCH_SIZE)):
+        PatientLookupKey.objects.bulk_create([
+            PatientLookupKey(patient_id=pk, field=field, key=key)
+            for pk, *values in batch
+            for field, key in patient_keys(*values)
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientLookupKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.PositiveSmallIntegerField(choices=[(1, 'Name'), (2, 'Mobile'), (3, 'Aadhaar'), (4, 'Admission number')])),
+                ('key', models.CharField(max_length=100)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lookup_keys', to='core.patientprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key'], name='patient_lookup_key_idx')],
+            },
+        ),
+        migrations.RunPython(index_existing_patients, migrations.RunPython.noop),
+    ]
@@ -53,6 +53,29 @@ class PatientProfile(models.Model):
     def get_age(self):
         return timezone.now().year - self.date_of_birth.year
 
+class AppointmentQuerySet(models.QuerySet):
+    def with_current_status(self, today=None):
+        """Annotate ``current_status``, reading past appointments as Completed.
+
+        Lets pages show the right status without writing, whether or not the
+        ``expire_appointments`` sweep has run yet.
+        """
+        today = today or timezone.localdate()
+        return self.annotate(current_status=models.Case(
+            models.When(appointment_date__lt=today, then=models.Value('Completed')),
+            default=models.F('status'),
+            output_field=models.CharField(),
+        ))
+
+    def past_due(self, today=None):
+        """Appointments from earlier days that are not marked Completed yet."""
+        today = today or timezone.localdate()
+        return self.filter(appointment_date__lt=today).exclude(status='Completed')
+
+    def expire(self, today=None):
+        """Mark every past appointment Completed in one UPDATE."""
+        return self.past_due(today).update(status='Completed')
+
 class Appointment(models.Model):
     patient = models.ForeignKey(PatientProfile, on_delete=models.CASCADE)
     appointment_date = models.DateField()
@@ -61,10 +84,19 @@ class Appointment(models.Model):
     token_number = models.IntegerField()
     token_reset_date = models.DateTimeField(null=True, blank=True)
     is_priority = models.BooleanField(default=False)
-    status = models.CharField(max_length=10, choices=[('Booked', 'Booked'), ('Completed', 'Completed')], default='Booked')
+    status = models.CharField(max_length=10, choices=[('Booked', 'Booked'), ('Called', 'Called'), ('Completed', 'Completed')], default='Booked')
     submitted_at = models.DateTimeField(auto_now_add=True)
+
+    objects = AppointmentQuerySet.as_manager()
+
     class Meta:
         unique_together = ('admission_number', 'appointment_date')
+        indexes = [
+            # Today's queue in token order, and per-day token/expiry sweeps.
+            models.Index(fields=['appointment_date', 'token_number'], name='appt_date_token_idx'),
+            # A patient's history and the one-booking-per-day check.
+            models.Index(fields=['patient', 'appointment_date'], name='appt_patient_date_idx'),
+        ]
     def __str__(self):
         return f"{self.patient.name} - Token {self.token_number}"
 class StaffProfile(models.Model):
@@ -82,6 +114,11 @@ class StaffProfile(models.Model):
     contact = models.CharField(max_length=15)
     address = models.TextField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['role'], name='staff_role_idx'),
+        ]
+
 class InpatientRecord(models.Model):
     patient = models.ForeignKey(PatientProfile, on_delete=models.CASCADE)
     bed_number = models.IntegerField()
@@ -91,6 +128,17 @@ class InpatientRecord(models.Model):
     treatment_plan = models.TextField()
     created_by = models.ForeignKey(StaffProfile, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            # Record search by patient for the signed-in staff member, newest first.
+            models.Index(fields=['patient', 'created_by', 'admitted_date'], name='inpat_patient_staff_idx'),
+            # Date-range filters and the newest-first listing.
+            models.Index(fields=['admitted_date'], name='inpat_admitted_idx'),
+            # Open admissions only; stays small however long the history grows.
+            models.Index(fields=['bed_number'], name='inpat_open_bed_idx',
+                         condition=models.Q(discharged_date__isnull=True)),
+        ]
+
     def __str__(self):
         return f"Inpatient: {self.patient.name}"
 
@@ -103,10 +151,178 @@ class OutpatientRecord(models.Model):
     next_visit_date = models.DateField(null=True, blank=True)
     created_by = models.ForeignKey(StaffProfile, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient', 'created_by', 'visit_date'], name='outpat_patient_staff_idx'),
+            models.Index(fields=['visit_date'], name='outpat_visit_idx'),
+        ]
+
     def __str__(self):
         return f"Outpatient: {self.patient.name}"
 
 
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+
+class DailyCensus(models.Model):
+    """Per-day rollup of admissions, discharges and outpatient visits.
+
+    Kept current by the signal handlers in ``core.signals`` and rebuilt in bulk
+    by the ``rebuild_census`` management command.
+    """
+    date = models.DateField(unique=True)
+    admissions = models.IntegerField(default=0)
+    discharges = models.IntegerField(default=0)
+    outpatient_visits = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Census {self.date}"
+
+
+class AdmissionSequence(models.Model):
+    """Last admission serial handed out for a hospital code and year.
+
+    Allocation goes through ``core.sequences`` which increments this row in
+    place, so registering a patient never has to scan existing profiles.
+    """
+    hospital_code = models.CharField(max_length=10)
+    year = models.IntegerField()
+    last_serial = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('hospital_code', 'year')
+
+    def __str__(self):
+        return f"{self.hospital_code}{self.year}: {self.last_serial}"
+
+
+class TokenDispenser(models.Model):
+    """Last token handed out from one queue on one day.
+
+    Tokens restart every day because each day gets its own rows. Allocation
+    goes through ``core.tokens``.
+    """
+    QUEUE_CHOICES = [
+        ('priority', 'Priority'),
+        ('normal', 'Normal'),
+    ]
+
+    day = models.DateField()
+    queue = models.CharField(max_length=10, choices=QUEUE_CHOICES)
+    last_token = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('day', 'queue')
+
+    def __str__(self):
+        return f"{self.day} {self.queue}: {self.last_token}"
+
+
+class Ward(models.Model):
+    """A ward and its bed counters.
+
+    ``capacity`` and ``occupied`` are maintained by ``core.beds`` as beds are
+    added and patients admitted or discharged, so occupancy questions are
+    answered without counting inpatient records.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    capacity = models.IntegerField(default=0)
+    occupied = models.IntegerField(default=0)
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def free(self):
+        return self.capacity - self.occupied
+
+
+class Bed(models.Model):
+    """A physical bed. ``number`` is what ``InpatientRecord.bed_number`` refers to."""
+    ward = models.ForeignKey(Ward, on_delete=models.CASCADE, related_name='beds')
+    number = models.IntegerField(unique=True)
+    occupant = models.OneToOneField(
+        InpatientRecord, null=True, blank=True, on_delete=models.SET_NULL, related_name='bed'
+    )
+
+    class Meta:
+        indexes = [
+            # Free beds only, in allocation order.
+            models.Index(fields=['ward', 'number'], name='bed_free_idx',
+                         condition=models.Q(occupant__isnull=True)),
+        ]
+
+    def __str__(self):
+        return f"Bed {self.number} ({self.ward})"
+
+
+class SearchPosting(models.Model):
+    """One term of one indexed document, for databases without SQLite FTS5.
+
+    Written and queried by ``core.search``; on SQLite with FTS5 the virtual
+    table created in the migrations is used instead and this stays empty.
+    """
+    KIND_CHOICES = [
+        (1, 'Outpatient record'),
+        (2, 'Inpatient record'),
+        (3, 'Appointment'),
+    ]
+
+    term = models.CharField(max_length=64)
+    kind = models.PositiveSmallIntegerField(choices=KIND_CHOICES)
+    object_id = models.IntegerField()
+    weight = models.IntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'kind', 'object_id'], name='search_term_idx'),
+            models.Index(fields=['kind', 'object_id'], name='search_document_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} -> {self.kind}:{self.object_id}"
+
+
+class PatientLookupKey(models.Model):
+    """A normalized search key for typeahead patient lookup.
+
+    Each patient gets keys for the full name, each later word of the name,
+    the mobile and Aadhaar digits and the admission number, all maintained
+    by ``core.lookup``. Prefix lookups are range scans on ``key``.
+    """
+    FIELD_CHOICES = [
+        (1, 'Name'),
+        (2, 'Mobile'),
+        (3, 'Aadhaar'),
+        (4, 'Admission number'),
+    ]
+
+    patient = models.ForeignKey(PatientProfile, on_delete=models.CASCADE, related_name='lookup_keys')
+    field = models.PositiveSmallIntegerField(choices=FIELD_CHOICES)
+    key = models.CharField(max_length=100)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['key'], name='patient_lookup_key_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} -> {self.patient_id}"
+
+
+class TableVersion(models.Model):
+    """A change counter for one listed table.
+
+    ``core.versions`` bumps it whenever a row of the table is saved or
+    deleted. Cached fragments of the table are keyed by the counter, so a
+    change makes the old fragments unreachable instead of deleting them.
+    """
+    table = models.CharField(max_length=30, unique=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.table} v{self.version}"
@@ -0,0 +1,136 @@
+"""Keyset (cursor) pagination for large listings.
+
+Pages are fetched with ``WHERE (ordering columns) after (last row seen)``
+instead of OFFSET, so every page costs the same however deep the client
+has scrolled, and rows inserted meanwhile do not shift later pages.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from functools import reduce
+from operator import or_
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+@dataclass
+class KeysetPage:
+    items: list
+    next_cursor: str = None
+    next_url: str = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def _field_name(term):
+    name = term.lstrip('-')
+    return 'pk' if name in ('pk', 'id') else name
+
+
+def _row_value(row, name):
+    if isinstance(row, dict):  # a .values() row
+        return row['id' if name == 'pk' else name]
+    for part in name.split('__'):
+        row = getattr(row, part)
+    return row
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, queryset, ordering):
+    """Turn a cursor back into typed values for the ordering fields."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, binascii.Error):
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise InvalidCursor(cursor)
+
+    opts = queryset.model._meta
+    typed = []
+    for term, value in zip(ordering, values):
+        name = _field_name(term)
+        model_field = opts.pk if name == 'pk' else opts.get_field(name)
+        try:
+            value = model_field.to_python(value)
+        except Exception:
+            raise InvalidCursor(cursor)
+        # Ordering columns are never null, and a null can't be compared with lt/gt.
+        if value is None:
+            raise InvalidCursor(cursor)
+        typed.append(value)
+    return typed
+
+
+def _after(ordering, values):
+    """Q object selecting the rows that sort after ``values``.
+
+    For ``(a DESC, pk DESC)`` this is ``a < va OR (a = va AND pk < vpk)``.
+    """
+    clauses = []
+    for i, term in enumerate(ordering):
+        name = _field_name(term)
+        lookup = 'lt' if term.startswith('-') else 'gt'
+        equal = {_field_name(t): v for t, v in zip(ordering[:i], values[:i])}
+        clauses.append(Q(**equal, **{f'{name}__{lookup}': values[i]}))
+    return reduce(or_, clauses)
+
+
+def paginate(queryset, ordering, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Return one :class:`KeysetPage` of ``queryset``.
+
+    ``ordering`` must end with a unique column (normally ``pk``) so every row
+    has a distinct position. Raises :class:`InvalidCursor` for a bad cursor.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = queryset.filter(_after(ordering, decode_cursor(cursor, queryset, ordering)))
+
+    rows = list(queryset[:limit + 1])
+    if len(rows) <= limit:
+        return KeysetPage(rows)
+    rows = rows[:limit]
+    last = rows[-1]
+    return KeysetPage(rows, encode_cursor([_row_value(last, _field_name(t)) for t in ordering]))
+
+
+def paginate_request(request, queryset, ordering, param='cursor', limit=DEFAULT_PAGE_SIZE):
+    """Paginate from ``request.GET[param]``, starting over if the cursor is bad.
+
+    The returned page's ``next_url`` is a query string for the following page
+    that keeps the request's other parameters.
+    """
+    try:
+        page = paginate(queryset, ordering, request.GET.get(param), limit)
+    except InvalidCursor:
+        page = paginate(queryset, ordering, None, limit)
+    if page.has_next:
+        params = request.GET.copy()
+        params[param] = page.next_cursor
+        page.next_url = '?' + params.urlencode()
+    return page
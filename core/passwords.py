@@ -0,0 +1,99 @@
+"""Password hashing off the request path.
+
+Hashing is deliberately slow: PBKDF2 with Django's default cost takes a
+third of a second of CPU here. The async login and registration views hand
+it to a bounded thread pool of ``HMS_HASHER_WORKERS`` threads (default: one
+per CPU). hashlib releases the GIL while hashing, so the threads run in
+parallel. The event loop stays free, and a login rush queues for the pool
+instead of starving every other request of CPU.
+
+The preferred hasher is the first entry of ``PASSWORD_HASHERS``, chosen with
+``HMS_PASSWORD_HASHER`` in settings. A password stored with any other hasher,
+or with an outdated cost, is rehashed the next time its owner logs in.
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import ScryptPasswordHasher, check_password, make_password
+from django.contrib.auth.signals import user_login_failed
+
+from . import writer
+from .models import User
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    """Scrypt with its cost read from ``HMS_SCRYPT_*`` settings.
+
+    It keeps the ``scrypt`` algorithm name, so it replaces Django's scrypt
+    hasher. Stored hashes carry their own parameters and still verify after
+    the cost changes, and are then upgraded at the next login.
+    """
+
+    @property
+    def work_factor(self):
+        return getattr(settings, 'HMS_SCRYPT_WORK_FACTOR', 2 ** 14)
+
+    @property
+    def block_size(self):
+        return getattr(settings, 'HMS_SCRYPT_BLOCK_SIZE', 8)
+
+    @property
+    def parallelism(self):
+        return getattr(settings, 'HMS_SCRYPT_PARALLELISM', 1)
+
+    @property
+    def maxmem(self):
+        # Scrypt needs 128 * N * r bytes; OpenSSL refuses more than 32 MB unless told.
+        return 256 * self.work_factor * self.block_size
+
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        workers = getattr(settings, 'HMS_HASHER_WORKERS', None) or os.cpu_count() or 1
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hasher')
+    return _executor
+
+
+async def run_in_pool(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), functools.partial(fn, *args))
+
+
+async def amake_password(password):
+    return await run_in_pool(make_password, password)
+
+
+def verify(password, encoded):
+    """Return ``(valid, new_hash)``; ``new_hash`` is set when the password should be rehashed."""
+    upgraded = []
+    valid = check_password(password, encoded, setter=lambda raw: upgraded.append(make_password(raw)))
+    return valid, upgraded[0] if upgraded else None
+
+
+async def aauthenticate(request, mobile, password):
+    """Check a mobile number and password with the hashing in the pool.
+
+    Returns the active user, or None. An outdated hash is replaced. The
+    ``user_login_failed`` signal is sent for a failure, as ``authenticate``
+    would.
+    """
+    user = await User.objects.filter(mobile=mobile).afirst()
+    if user is None:
+        # Hash anyway, so an unknown number takes as long as a wrong password.
+        await amake_password(password)
+    else:
+        valid, new_hash = await run_in_pool(verify, password, user.password)
+        if valid and user.is_active:
+            if new_hash:
+                user.password = new_hash
+                await sync_to_async(writer.run)(user.save, update_fields=['password'])
+            return user
+    await user_login_failed.asend(sender=__name__, credentials={'mobile': mobile}, request=request)
+    return None
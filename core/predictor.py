@@ -1,19 +1,86 @@
-import pandas as pd
-from sklearn.linear_model import LinearRegression
-import numpy as np
+"""Next-day forecasts from a linear trend over daily counts.
 
-def train_predict_model(csv_path):
-    df = pd.read_csv(csv_path, parse_dates=['Date'])
-    df = df.sort_values('Date')
-    df['day_num'] = np.arange(len(df))
+numpy, pandas and scikit-learn are imported on first use rather than with
+this module. Together they add hundreds of milliseconds and tens of MB to
+every worker that would otherwise never fit a forecast; see bench_startup.
+"""
+import os
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+DATA_DIR = Path(__file__).resolve().parent / 'data'
+INPATIENT_CSV = DATA_DIR / 'Book1.csv'
+OUTPATIENT_CSV = DATA_DIR / 'Book2.csv'
+
+Forecast = namedtuple('Forecast', ['intercept', 'slope', 'days', 'prediction'])
+
+# Fitted forecasts keyed by data source. Each entry keeps the fingerprint of
+# the data it was fitted on, so a changed source is refitted on next use and
+# an unchanged one is answered from memory.
+_forecasts = {}
+_forecasts_lock = threading.Lock()
 
-    X = df[['day_num']]
-    y = df['Count']
+
+def fit_series(counts):
+    """Fit a linear trend to a daily series of counts and forecast the next day."""
+    import numpy as np
+    from sklearn.linear_model import LinearRegression
+
+    counts = np.asarray(counts, dtype=float)
+    X = np.arange(len(counts)).reshape(-1, 1)
 
     model = LinearRegression()
-    model.fit(X, y)
+    model.fit(X, counts)
+
+    intercept = float(model.intercept_)
+    slope = float(model.coef_[0])
+    predicted = intercept + slope * len(counts)
+    return Forecast(intercept, slope, len(counts), round(predicted))
+
+
+def cached_forecast(source, fingerprint, load_counts):
+    """Return the forecast for ``source``, refitting only when ``fingerprint`` changes.
+
+    ``load_counts`` is only called on a cache miss and must return the daily
+    counts in date order.
+    """
+    entry = _forecasts.get(source)
+    if entry is not None and entry[0] == fingerprint:
+        return entry[1]
 
+    with _forecasts_lock:
+        entry = _forecasts.get(source)
+        if entry is None or entry[0] != fingerprint:
+            entry = (fingerprint, fit_series(load_counts()))
+            _forecasts[source] = entry
+    return entry[1]
+
+
+def clear_forecasts():
+    with _forecasts_lock:
+        _forecasts.clear()
+
+
+def csv_fingerprint(csv_path):
+    stat = os.stat(csv_path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _read_csv_counts(csv_path):
+    import pandas as pd
+
+    df = pd.read_csv(csv_path, parse_dates=['Date'])
+    df = df.sort_values('Date')
+    return df['Count'].tolist()
+
+
+def train_predict_model(csv_path):
+    csv_path = os.path.abspath(csv_path)
+    forecast = cached_forecast(
+        ('csv', csv_path),
+        csv_fingerprint(csv_path),
+        lambda: _read_csv_counts(csv_path),
+    )
     # Predict the next day's count
-    next_day = [[len(df)]]
-    predicted = model.predict(next_day)[0]
-    return round(predicted)
+    return forecast.prediction
@@ -0,0 +1,155 @@
+"""Live queue events for the today's-appointments board.
+
+Appointment writes publish small events (booked, called, completed) to a
+broker after their transaction commits, and the ``queue_stream`` view relays
+them to every connected display as server-sent events. One write therefore
+fans out to any number of screens without them polling the database.
+
+The broker is loaded from ``HMS_QUEUE_BROKER``. If that cannot be imported or
+constructed, the in-process :class:`LocalBroker` is used instead, which
+reaches every subscriber served by the same process.
+"""
+import asyncio
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BROKER = 'core.queue_events.LocalBroker'
+
+# Seconds between keep-alive comments on an idle stream.
+HEARTBEAT_INTERVAL = 15
+
+
+class Subscription:
+    """One subscriber's bounded event queue, bound to its event loop."""
+
+    def __init__(self, broker, channel, max_pending):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(max_pending)
+
+    def offer(self, message):
+        # Runs on the subscriber's loop. A display that falls behind loses its
+        # oldest messages rather than holding memory for the whole day.
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        """Next message, or ``None`` after ``timeout`` seconds without one."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """In-process pub/sub. ``publish`` may be called from any thread."""
+
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        """Register a subscriber; must be called from a running event loop."""
+        subscription = Subscription(self, channel, self.max_pending)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, message)
+            except RuntimeError:
+                # The subscriber's loop has closed; drop it.
+                self.unsubscribe(subscription)
+        return len(subscribers)
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, 'HMS_QUEUE_BROKER', DEFAULT_BROKER)
+                try:
+                    _broker = import_string(path)()
+                except Exception:
+                    logger.warning('Queue broker %s unavailable, using LocalBroker', path, exc_info=True)
+                    _broker = LocalBroker()
+    return _broker
+
+
+def channel_for(day):
+    return f'queue:{day.isoformat()}'
+
+
+def appointment_event(kind, appointment):
+    return {
+        'event': kind,
+        'id': appointment.pk,
+        'token_number': appointment.token_number,
+        'name': appointment.patient.name,
+        'date_of_birth': appointment.patient.date_of_birth,
+        'admission_number': appointment.patient.admission_number,
+        'is_priority': appointment.is_priority,
+        'status': appointment.status,
+        'submitted_at': appointment.submitted_at,
+    }
+
+
+def publish_appointment(kind, appointment):
+    # Serialized once here; every subscriber receives the finished frame.
+    frame = format_sse(appointment_event(kind, appointment))
+    get_broker().publish(channel_for(appointment.appointment_date), frame)
+
+
+def format_sse(event):
+    data = json.dumps(event, cls=DjangoJSONEncoder)
+    return f"event: {event['event']}\ndata: {data}\n\n"
+
+
+async def event_stream(channel, heartbeat=HEARTBEAT_INTERVAL, broker=None):
+    """Yield server-sent-event frames for ``channel`` until cancelled.
+
+    The subscription is made when streaming starts and dropped when the
+    client disconnects.
+    """
+    subscription = (broker or get_broker()).subscribe(channel)
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            frame = await subscription.get(timeout=heartbeat)
+            yield ': keep-alive\n\n' if frame is None else frame
+    finally:
+        subscription.close()
@@ -0,0 +1,257 @@
+"""Full-text search over clinical free text.
+
+Outpatient symptoms/diagnosis/prescription, inpatient case type/treatment
+plan and appointment symptoms are indexed as one document per row. The
+signal handlers in ``core.signals`` keep the index in step with saves and
+deletes; the ``rebuild_search_index`` command refills it from scratch.
+
+Two backends share one interface:
+
+* SQLite with FTS5 uses the ``core_search_fts`` virtual table created in the
+  migrations, ranked by bm25, with prefix matching on the last query word.
+* Anything else uses :class:`~core.models.SearchPosting`, an inverted index
+  built by the tokenizer here and ranked by tf-idf in SQL. The document
+  total behind idf is cached under the tables' version counters
+  (``core.versions``), so it is only counted again after a change.
+
+``HMS_SEARCH_BACKEND`` may be ``'auto'`` (default), ``'fts5'`` or
+``'postings'``. Rebuild the index after changing it.
+"""
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+
+from . import versions
+from .models import Appointment, InpatientRecord, OutpatientRecord, SearchPosting
+
+FTS_TABLE = 'core_search_fts'
+PAGE_SIZE = 20
+
+# kind -> (model, label, indexed text fields). The kind codes match
+# SearchPosting.KIND_CHOICES.
+DOCUMENTS = {
+    1: (OutpatientRecord, 'outpatient', ('symptoms', 'diagnosis', 'prescription')),
+    2: (InpatientRecord, 'inpatient', ('case_type', 'treatment_plan')),
+    3: (Appointment, 'appointment', ('symptom_or_disease',)),
+}
+KINDS = {model: kind for kind, (model, _, _) in DOCUMENTS.items()}
+LABELS = {label: kind for kind, (_, label, _) in DOCUMENTS.items()}
+DOCUMENT_TABLES = tuple(versions.TABLES[model] for model, _, _ in DOCUMENTS.values())
+
+# FTS5 rows are keyed by a single integer: pk * KIND_SLOTS + kind.
+KIND_SLOTS = 4
+
+TOKEN_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+
+
+def document_total():
+    """Number of indexed documents, counted once per change to their tables."""
+    key = 'hms:search:documents:' + ':'.join(map(str, versions.current(*DOCUMENT_TABLES).values()))
+    options = versions.fragment_settings()
+    cache = caches[options['fragment_cache']]
+    total = cache.get(key)
+    if total is None:
+        total = sum(model.objects.count() for model, _, _ in DOCUMENTS.values())
+        cache.set(key, total, options['fragment_ttl'])
+    return total
+
+
+def tokenize(text):
+    return [word[:MAX_TERM_LENGTH] for word in TOKEN_RE.findall(text.lower()) if len(word) > 1]
+
+
+def document_body(values):
+    return '\n'.join(value for value in values if value)
+
+
+class FTS5Backend:
+    name = 'fts5'
+
+    def _execute(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def index(self, kind, pk, body):
+        rowid = pk * KIND_SLOTS + kind
+        self._execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [rowid])
+        if body:
+            self._execute(f'INSERT INTO {FTS_TABLE}(rowid, body) VALUES (%s, %s)', [rowid, body])
+
+    def remove(self, kind, pk):
+        self._execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk * KIND_SLOTS + kind])
+
+    def clear(self):
+        self._execute(f'DELETE FROM {FTS_TABLE}')
+
+    def bulk_index(self, kind, documents):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE}(rowid, body) VALUES (%s, %s)',
+                [(pk * KIND_SLOTS + kind, body) for pk, body in documents if body],
+            )
+
+    def search(self, terms, kinds, offset, limit):
+        # Words only ever contain \w characters, so quoting them is enough to
+        # stop FTS5 reading them as operators. The last word also matches as
+        # a prefix, for search-as-you-type.
+        match = ' '.join(f'"{term}"' for term in terms) + '*'
+        sql = f'SELECT rowid, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+        params = [match]
+        if len(kinds) < len(DOCUMENTS):
+            sql += f' AND rowid %% {KIND_SLOTS} IN ({", ".join(["%s"] * len(kinds))})'
+            params.extend(kinds)
+        sql += ' ORDER BY rank LIMIT %s OFFSET %s'
+        params.extend([limit, offset])
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            # bm25 ranks are negative, best first; flip them into scores.
+            return [(rowid % KIND_SLOTS, rowid // KIND_SLOTS, -rank) for rowid, rank in cursor.fetchall()]
+
+
+class PostingsBackend:
+    name = 'postings'
+
+    def _postings(self, kind, pk, body):
+        return [
+            SearchPosting(term=term, kind=kind, object_id=pk, weight=weight)
+            for term, weight in Counter(tokenize(body)).items()
+        ]
+
+    def index(self, kind, pk, body):
+        self.remove(kind, pk)
+        SearchPosting.objects.bulk_create(self._postings(kind, pk, body))
+
+    def remove(self, kind, pk):
+        SearchPosting.objects.filter(kind=kind, object_id=pk).delete()
+
+    def clear(self):
+        SearchPosting.objects.all().delete()
+
+    def bulk_index(self, kind, documents):
+        postings = [posting for pk, body in documents for posting in self._postings(kind, pk, body)]
+        SearchPosting.objects.bulk_create(postings, batch_size=1000)
+
+    def search(self, terms, kinds, offset, limit):
+        terms = list(dict.fromkeys(terms))
+        frequencies = dict(
+            SearchPosting.objects.filter(term__in=terms).values_list('term').annotate(n=Count('id')).order_by()
+        )
+        if len(frequencies) < len(terms):
+            return []  # some word appears nowhere, and every word must match
+        total = document_total()
+        score = Sum(Case(
+            *[When(term=term, then=F('weight') * Value(math.log(1 + total / n))) for term, n in frequencies.items()],
+            output_field=FloatField(),
+        ))
+        rows = (
+            SearchPosting.objects.filter(term__in=terms, kind__in=kinds)
+            .values('kind', 'object_id')
+            .annotate(matched=Count('id'), score=score)
+            .filter(matched=len(terms))
+            .order_by('-score', 'kind', 'object_id')
+        )[offset:offset + limit]
+        return [(row['kind'], row['object_id'], row['score']) for row in rows]
+
+
+_backends = {}
+
+
+def get_backend():
+    choice = getattr(settings, 'HMS_SEARCH_BACKEND', 'auto')
+    key = (choice, connection.alias, str(connection.settings_dict['NAME']))
+    if key not in _backends:
+        if choice == 'auto':
+            use_fts = connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+            choice = 'fts5' if use_fts else 'postings'
+        _backends[key] = FTS5Backend() if choice == 'fts5' else PostingsBackend()
+    return _backends[key]
+
+
+def index_instance(instance, update_fields=None):
+    kind = KINDS[type(instance)]
+    fields = DOCUMENTS[kind][2]
+    if update_fields is not None and not set(fields) & set(update_fields):
+        return  # e.g. a status change; the indexed text is untouched
+    body = document_body([getattr(instance, field) for field in fields])
+    get_backend().index(kind, instance.pk, body)
+
+
+def remove_instance(instance):
+    get_backend().remove(KINDS[type(instance)], instance.pk)
+
+
+def rebuild(batch_size=1000):
+    """Re-index every document. Returns the number of documents indexed."""
+    backend = get_backend()
+    total = 0
+    with transaction.atomic():
+        backend.clear()
+        for kind, (model, _, fields) in DOCUMENTS.items():
+            rows = model.objects.order_by('pk').values_list('pk', *fields).iterator(chunk_size=batch_size)
+            batch = []
+            for pk, *values in rows:
+                batch.append((pk, document_body(values)))
+                if len(batch) == batch_size:
+                    backend.bulk_index(kind, batch)
+                    total += len(batch)
+                    batch = []
+            backend.bulk_index(kind, batch)
+            total += len(batch)
+    return total
+
+
+@dataclass
+class SearchResult:
+    kind: str
+    object: object
+    score: float
+
+
+@dataclass
+class SearchPage:
+    results: list
+    page: int
+    has_next: bool
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __len__(self):
+        return len(self.results)
+
+
+def search(query, kinds=None, page=1, page_size=PAGE_SIZE):
+    """Best-ranked documents matching every word of ``query``.
+
+    ``kinds`` limits the result to some of 'outpatient', 'inpatient' and
+    'appointment'. Records are loaded with their patient in one query per
+    kind.
+    """
+    terms = tokenize(query)
+    kind_codes = sorted(LABELS[label] for label in kinds) if kinds else sorted(DOCUMENTS)
+    page = max(1, page)
+    if not terms or not kind_codes:
+        return SearchPage([], page, False)
+
+    hits = get_backend().search(terms, kind_codes, (page - 1) * page_size, page_size + 1)
+    has_next = len(hits) > page_size
+    hits = hits[:page_size]
+
+    objects = {}
+    for kind in {kind for kind, _, _ in hits}:
+        model, _, _ = DOCUMENTS[kind]
+        ids = [pk for hit_kind, pk, _ in hits if hit_kind == kind]
+        objects[kind] = model.objects.select_related('patient').in_bulk(ids)
+    results = [
+        SearchResult(DOCUMENTS[kind][1], objects[kind][pk], score)
+        for kind, pk, score in hits
+        if pk in objects[kind]
+    ]
+    return SearchPage(results, page, has_next)
@@ -0,0 +1,71 @@
+from datetime import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import AdmissionSequence, PatientProfile
+
+HOSPITAL_CODE = 'HOSP01'
+SERIAL_WIDTH = 6
+
+
+def format_admission_number(hospital_code, year, serial):
+    return f"{hospital_code}{year}{str(serial).zfill(SERIAL_WIDTH)}"
+
+
+def _highest_existing_serial(prefix):
+    # Compared as numbers: legacy serials need not share SERIAL_WIDTH, so the
+    # string order of admission numbers is not their numeric order. This runs
+    # once per hospital and year, when the sequence row is created. Malformed
+    # numbers are skipped.
+    numbers = PatientProfile.objects.filter(
+        admission_number__startswith=prefix
+    ).values_list('admission_number', flat=True)
+    serials = (adm_num[len(prefix):] for adm_num in numbers.iterator(chunk_size=2000))
+    return max((int(serial) for serial in serials if serial.isdigit()), default=0)
+
+
+def _create_sequence(hospital_code, year):
+    # First allocation for this hospital/year: start after any numbers issued
+    # before the sequence table existed.
+    prefix = f"{hospital_code}{year}"
+    try:
+        with transaction.atomic():
+            AdmissionSequence.objects.create(
+                hospital_code=hospital_code,
+                year=year,
+                last_serial=_highest_existing_serial(prefix),
+            )
+    except IntegrityError:
+        pass  # created concurrently by another registration
+
+
+def allocate_admission_serials(count=1, hospital_code=HOSPITAL_CODE, year=None):
+    """Reserve ``count`` consecutive serials and return the first one.
+
+    The counter row is bumped with a single ``UPDATE ... SET last_serial =
+    last_serial + count`` which takes the row (or SQLite write) lock, then read
+    back inside the same transaction, so concurrent callers never receive the
+    same block. Cost is independent of the number of patients.
+    """
+    if count < 1:
+        raise ValueError('count must be at least 1')
+    year = year or datetime.now().year
+
+    with transaction.atomic():
+        sequence = AdmissionSequence.objects.filter(hospital_code=hospital_code, year=year)
+        if not sequence.update(last_serial=F('last_serial') + count):
+            _create_sequence(hospital_code, year)
+            sequence.update(last_serial=F('last_serial') + count)
+        last_serial = sequence.values_list('last_serial', flat=True).get()
+    return last_serial - count + 1
+
+
+def allocate_admission_numbers(count=1, hospital_code=HOSPITAL_CODE, year=None):
+    """Reserve a block of ``count`` admission numbers, e.g. for a bulk import."""
+    year = year or datetime.now().year
+    first = allocate_admission_serials(count, hospital_code, year)
+    return [
+        format_admission_number(hospital_code, year, serial)
+        for serial in range(first, first + count)
+    ]
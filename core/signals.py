@@ -0,0 +1,162 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import accounts, beds, census, dashboard, lookup, queue_events, search, versions
+from .models import Appointment, Bed, InpatientRecord, OutpatientRecord, PatientProfile, StaffProfile, User, Ward
+
+# Fields whose previous value the post_save handlers need to see. pre_save
+# stashes them on the instance so an edit can be applied as a delta.
+TRACKED_FIELDS = {
+    Appointment: ('status',),
+    InpatientRecord: ('admitted_date', 'discharged_date'),
+    OutpatientRecord: ('visit_date',),
+    Bed: ('ward_id', 'occupant_id'),
+}
+
+
+def _previous(instance, field):
+    return getattr(instance, '_previous_state', {}).get(field)
+
+
+@receiver(pre_save, sender=Appointment)
+@receiver(pre_save, sender=InpatientRecord)
+@receiver(pre_save, sender=OutpatientRecord)
+@receiver(pre_save, sender=Bed)
+def remember_previous_state(sender, instance, **kwargs):
+    fields = TRACKED_FIELDS[sender]
+    previous = None
+    if instance.pk:
+        previous = sender.objects.filter(pk=instance.pk).values(*fields).first()
+    instance._previous_state = previous or {}
+
+
+@receiver(post_save, sender=InpatientRecord)
+def update_census_for_inpatient(sender, instance, **kwargs):
+    census.apply_changes('admissions', _previous(instance, 'admitted_date'), instance.admitted_date)
+    census.apply_changes('discharges', _previous(instance, 'discharged_date'), instance.discharged_date)
+
+
+@receiver(post_delete, sender=InpatientRecord)
+def remove_inpatient_from_census(sender, instance, **kwargs):
+    census.apply_changes('admissions', instance.admitted_date, None)
+    census.apply_changes('discharges', instance.discharged_date, None)
+
+
+@receiver(post_save, sender=OutpatientRecord)
+def update_census_for_outpatient(sender, instance, **kwargs):
+    census.apply_changes('outpatient_visits', _previous(instance, 'visit_date'), instance.visit_date)
+
+
+@receiver(post_delete, sender=OutpatientRecord)
+def remove_outpatient_from_census(sender, instance, **kwargs):
+    census.apply_changes('outpatient_visits', instance.visit_date, None)
+
+
+@receiver(post_save, sender=InpatientRecord)
+def update_bed_occupancy(sender, instance, **kwargs):
+    beds.sync_admission(instance)
+
+
+@receiver(pre_delete, sender=InpatientRecord)
+def free_bed_of_deleted_record(sender, instance, **kwargs):
+    beds.release(instance)
+
+
+@receiver(post_save, sender=Bed)
+def count_saved_bed(sender, instance, created, **kwargs):
+    if created or not instance._previous_state:
+        beds.bed_added(instance)
+    else:
+        beds.bed_changed(instance, _previous(instance, 'ward_id'), _previous(instance, 'occupant_id') is not None)
+
+
+@receiver(post_delete, sender=Bed)
+def uncount_deleted_bed(sender, instance, **kwargs):
+    beds.bed_removed(instance)
+
+
+@receiver(post_save, sender=PatientProfile)
+@receiver(post_delete, sender=PatientProfile)
+@receiver(post_save, sender=StaffProfile)
+@receiver(post_delete, sender=StaffProfile)
+@receiver(post_save, sender=InpatientRecord)
+@receiver(post_delete, sender=InpatientRecord)
+@receiver(post_save, sender=OutpatientRecord)
+@receiver(post_delete, sender=OutpatientRecord)
+@receiver(post_save, sender=Ward)
+@receiver(post_delete, sender=Ward)
+@receiver(post_save, sender=Bed)
+@receiver(post_delete, sender=Bed)
+def invalidate_dashboard_stats(sender, **kwargs):
+    # After commit: a request counting in between would cache the old numbers.
+    transaction.on_commit(dashboard.invalidate, robust=True)
+
+
+QUEUE_EVENTS = {
+    'Called': 'called',
+    'Completed': 'completed',
+}
+
+
+@receiver(post_save, sender=Appointment)
+def publish_queue_event(sender, instance, created, **kwargs):
+    if created:
+        kind = 'booked'
+    elif _previous(instance, 'status') != instance.status:
+        kind = QUEUE_EVENTS.get(instance.status)
+    else:
+        kind = None
+    if kind:
+        transaction.on_commit(lambda: queue_events.publish_appointment(kind, instance), robust=True)
+
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_save, sender=InpatientRecord)
+@receiver(post_save, sender=OutpatientRecord)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    search.index_instance(instance, update_fields)
+
+
+@receiver(post_delete, sender=Appointment)
+@receiver(post_delete, sender=InpatientRecord)
+@receiver(post_delete, sender=OutpatientRecord)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.remove_instance(instance)
+
+
+@receiver(post_save, sender=PatientProfile)
+def update_patient_lookup(sender, instance, **kwargs):
+    lookup.index_patients([instance])
+
+
+@receiver(post_delete, sender=PatientProfile)
+def forget_patient_lookup(sender, instance, **kwargs):
+    # The keys themselves go with the profile (on_delete=CASCADE).
+    lookup.invalidate()
+
+
+@receiver(post_save, sender=PatientProfile)
+@receiver(post_delete, sender=PatientProfile)
+@receiver(post_save, sender=InpatientRecord)
+@receiver(post_delete, sender=InpatientRecord)
+@receiver(post_save, sender=OutpatientRecord)
+@receiver(post_delete, sender=OutpatientRecord)
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def bump_table_version(sender, **kwargs):
+    versions.bump_model(sender)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=PatientProfile)
+@receiver(post_delete, sender=PatientProfile)
+@receiver(post_save, sender=StaffProfile)
+@receiver(post_delete, sender=StaffProfile)
+def forget_cached_user(sender, instance, **kwargs):
+    user_id = instance.pk if sender is User else instance.user_id
+    accounts.invalidate(user_id)
+    # Again after commit, in case a request cached the old row in between.
+    transaction.on_commit(lambda: accounts.invalidate(user_id), robust=True)
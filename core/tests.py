@@ -1,3 +1,1118 @@
-from django.test import TestCase
+import asyncio
+import csv
+import importlib
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import warnings
+from unittest import mock, skipUnless
+from datetime import date, timedelta
+from io import StringIO
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import IntegrityError, connection, router, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from hospital_system import routers, sessions
+
+from . import accounts, beds, census, checks, dashboard, lookup, metrics, passwords, predictor, search
+from .models import (
+    Appointment, Bed, DailyCensus, InpatientRecord, OutpatientRecord, PatientLookupKey, PatientProfile, StaffProfile,
+    TokenDispenser, User, Ward,
+)
+from .pagination import encode_cursor
+from .queue_events import LocalBroker, event_stream
+from .management.commands.bench_startup import probe
+from .management.commands.bench_views import SCENARIOS, routes
+from .management.commands.snapshot_replica import snapshot
+from .sequences import allocate_admission_numbers
+from .tokens import dispense_token
+from .writer import SingleWriter
+
+
+@override_settings(HMS_PRIORITY_TOKEN_SLOTS=10)
+class TokenDispenserTests(TestCase):
+    def test_priority_slots_then_normal_queue(self):
+        day = date(2025, 4, 1)
+        priority = [dispense_token(day, True) for _ in range(12)]
+        self.assertEqual(priority, list(range(1, 13)))
+        self.assertEqual(dispense_token(day, False), 13)
+
+    def test_tokens_restart_each_day(self):
+        day = date(2025, 4, 1)
+        self.assertEqual(dispense_token(day, False), 11)
+        self.assertEqual(dispense_token(day, False), 12)
+        self.assertEqual(dispense_token(day + timedelta(days=1), False), 11)
+
+    @override_settings(HMS_PRIORITY_TOKEN_SLOTS=3)
+    def test_priority_capacity_is_configurable(self):
+        day = date(2025, 4, 1)
+        self.assertEqual([dispense_token(day, True) for _ in range(4)], [1, 2, 3, 4])
+        self.assertEqual(TokenDispenser.objects.get(day=day, queue='normal').last_token, 4)
+
+
+class TokenDispenserConcurrencyTests(TransactionTestCase):
+    bookings = 300
+
+    def test_concurrent_bookings_never_share_a_token(self):
+        day = date(2025, 4, 1)
+        barrier = threading.Barrier(self.bookings)
+        tokens = []
+        errors = []
+
+        def book(n):
+            try:
+                barrier.wait()
+                tokens.append(dispense_token(day, n % 4 == 0))
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book, args=(n,)) for n in range(self.bookings)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(tokens), self.bookings)
+        self.assertEqual(sorted(tokens), list(range(1, self.bookings + 1)))
+
+
+class AdmissionSequenceTests(TestCase):
+    def add_patient(self, n, admission_number):
+        PatientProfile.objects.create(
+            user=User.objects.create_user(f'90000000{n:02d}', password='x'), name=f'Patient {n}',
+            date_of_birth=date(1980, 1, 1), gender='male', contact=f'90000000{n:02d}',
+            aadhaar_number=str(n), address='Address', admission_number=admission_number,
+        )
+
+    def test_seeds_from_the_numerically_highest_existing_serial(self):
+        self.add_patient(1, 'HOSP012025000009')
+        self.add_patient(2, 'HOSP0120250000100')  # a wider legacy serial
+        self.add_patient(3, 'HOSP012025abc')
+        self.add_patient(4, 'HOSP012024999999')
+        self.assertEqual(allocate_admission_numbers(2, year=2025), ['HOSP012025000101', 'HOSP012025000102'])
+
+    def test_each_year_starts_its_own_sequence(self):
+        self.assertEqual(allocate_admission_numbers(2, year=2025), ['HOSP012025000001', 'HOSP012025000002'])
+        self.assertEqual(allocate_admission_numbers(1, year=2026), ['HOSP012026000001'])
+        self.assertEqual(allocate_admission_numbers(1, year=2025), ['HOSP012025000003'])
+
+
+class AdmissionSequenceConcurrencyTests(TransactionTestCase):
+    registrations = 50
+
+    def test_concurrent_allocations_never_overlap(self):
+        barrier = threading.Barrier(self.registrations)
+        numbers = []
+        errors = []
+
+        def register(n):
+            try:
+                barrier.wait()
+                numbers.extend(allocate_admission_numbers(1 + n % 3, year=2025))
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=register, args=(n,)) for n in range(self.registrations)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        expected = sum(1 + n % 3 for n in range(self.registrations))
+        self.assertEqual(sorted(numbers), [f'HOSP012025{n:06d}' for n in range(1, expected + 1)])
+
+
+class SingleWriterTests(TransactionTestCase):
+    def test_queued_writes_commit_together_and_fail_independently(self):
+        day = date(2025, 4, 1)
+        single = SingleWriter()
+        futures = [single.submit(dispense_token, day, False) for _ in range(20)]
+        failed = single.submit(TokenDispenser.objects.create, day=day, queue='normal')
+        futures += [single.submit(dispense_token, day, False) for _ in range(20)]
+        self.assertEqual(sorted(f.result(timeout=10) for f in futures), list(range(11, 51)))
+        with self.assertRaises(IntegrityError):
+            failed.result(timeout=10)
+
+    def test_failing_commit_hook_does_not_fail_committed_writes(self):
+        def dispense():
+            transaction.on_commit(lambda: 1 / 0)
+            return dispense_token(date(2025, 4, 1), False)
+
+        single = SingleWriter()
+        with self.assertLogs('core.writer', 'ERROR'):
+            self.assertEqual(single.submit(dispense).result(timeout=10), 11)
+        self.assertEqual(TokenDispenser.objects.get().last_token, 11)
+
+    @override_settings(HMS_SERIALIZE_WRITES=True)
+    def test_concurrent_bookings_through_the_writer(self):
+        patient = PatientProfile.objects.create(
+            user=User.objects.create_user('9000000002', password='x'), name='Patient',
+            date_of_birth=date(1980, 1, 1), gender='male', contact='9000000002',
+            aadhaar_number='1', address='Address', admission_number='HOSP012025000001',
+        )
+        self.client.force_login(patient.user)
+        statuses = []
+
+        def book():
+            try:
+                client = self.client_class()
+                client.cookies = self.client.cookies
+                statuses.append(client.post('/patient/dashboard/', {'symptom_or_disease': 'Fever'}).status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(statuses, [302] * 5)
+        # Only one booking per patient per day, however the requests interleave.
+        self.assertEqual(Appointment.objects.filter(patient=patient).count(), 1)
+
+
+@mock.patch('hospital_system.routers.replica_configured', return_value=True)
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.used = []
+
+        def view(request):
+            self.used.append(router.db_for_read(PatientProfile))
+            return HttpResponse()
+
+        self.middleware = routers.ReplicaRoutingMiddleware(lambda request: self.call(request, view))
+
+    def call(self, request, view):
+        if request.method in routers.SAFE_METHODS:
+            view = routers.reporting_view(view)
+        self.middleware.process_view(request, view, (), {})
+        return view(request)
+
+    def test_reports_read_the_replica_until_the_client_writes(self, _):
+        factory = RequestFactory()
+        self.middleware(factory.get('/'))
+        response = self.middleware(factory.post('/'))
+        sticky = response.cookies[routers.STICKY_COOKIE].value
+        self.middleware(factory.get('/', HTTP_COOKIE=f'{routers.STICKY_COOKIE}={sticky}'))
+        self.assertEqual(self.used, ['replica', 'default', 'default'])
+        # Reads outside a request are never routed to the replica.
+        self.assertEqual(router.db_for_read(PatientProfile), 'default')
+
+    def test_routes_in_an_async_stack(self, _):
+        async def get_response(request):
+            await middleware.process_view(request, routers.reporting_view(lambda request: None), (), {})
+            self.used.append(router.db_for_read(PatientProfile))
+            return HttpResponse()
+
+        middleware = routers.ReplicaRoutingMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        asyncio.run(middleware(RequestFactory().get('/')))
+        self.assertEqual(self.used, ['replica'])
+
+    def test_snapshot_is_a_readable_copy(self, _):
+        with tempfile.TemporaryDirectory() as tmp:
+            source, target = os.path.join(tmp, 'primary.sqlite3'), os.path.join(tmp, 'replica.sqlite3')
+            with sqlite3.connect(source) as db:
+                db.execute('CREATE TABLE t (n INTEGER)')
+                db.execute('INSERT INTO t VALUES (1), (2)')
+            db.close()
+            snapshot(source, target)
+            replica = sqlite3.connect(f'file:{target}?mode=ro', uri=True)
+            self.assertEqual(replica.execute('SELECT count(*) FROM t').fetchone(), (2,))
+            replica.close()
+
+
+class StartupTests(TestCase):
+    def test_workers_boot_without_the_prediction_stack(self):
+        self.assertEqual(probe()['loaded'], [])
+
+
+class ForecastCacheTests(TestCase):
+    def setUp(self):
+        predictor.clear_forecasts()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.csv = os.path.join(directory.name, 'counts.csv')
+        self.write([10, 12, 14])
+
+    def write(self, counts):
+        with open(self.csv, 'w') as f:
+            f.write('Date,Count\n')
+            f.writelines(f'{day:02d}-04-2025,{count}\n' for day, count in enumerate(counts, 1))
+
+    def test_refits_only_when_the_csv_changes(self):
+        with mock.patch.object(predictor, 'fit_series', wraps=predictor.fit_series) as fit:
+            self.assertEqual(predictor.train_predict_model(self.csv), 16)
+            self.assertEqual(predictor.train_predict_model(self.csv), 16)
+            self.assertEqual(fit.call_count, 1)
+
+            self.write([10, 12, 14, 16])  # new size
+            self.assertEqual(predictor.train_predict_model(self.csv), 18)
+            self.assertEqual(fit.call_count, 2)
+
+            self.write([20, 22, 24, 26])  # same size, newer mtime
+            stat = os.stat(self.csv)
+            os.utime(self.csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            self.assertEqual(predictor.train_predict_model(self.csv), 28)
+            self.assertEqual(fit.call_count, 3)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['core.passwords.TunedScryptPasswordHasher', 'django.contrib.auth.hashers.MD5PasswordHasher'],
+    HMS_SCRYPT_WORK_FACTOR=2 ** 4,
+)
+class PasswordTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(
+            mobile='9000000002', role='patient', password=make_password('secret', hasher='md5'),
+        )
+
+    def test_login_upgrades_the_hash_to_the_preferred_hasher(self):
+        response = self.client.post('/login/', {'mobile': '9000000002', 'password': 'secret'})
+        self.assertRedirects(response, '/patient/dashboard/', fetch_redirect_response=False)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('scrypt$16$'))
+
+        with self.settings(HMS_SCRYPT_WORK_FACTOR=2 ** 5):
+            self.client.post('/login/', {'mobile': '9000000002', 'password': 'secret'})
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('scrypt$32$'))
+
+    def test_wrong_password_is_rejected_and_keeps_the_hash(self):
+        stored = self.user.password
+        response = self.client.post('/login/', {'mobile': '9000000002', 'password': 'wrong'})
+        self.assertEqual([str(m) for m in get_messages(response.wsgi_request)], ['Invalid login credentials'])
+        self.assertNotIn('_auth_user_id', self.client.session)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.password, stored)
+
+    def test_registration_hashes_in_the_pool(self):
+        response = self.client.post('/register/', {
+            'name': 'New Patient', 'date_of_birth': '1990-02-01', 'gender': 'female',
+            'contact': '9000000003', 'aadhaar_number': '123412341234', 'address': 'Address',
+        })
+        self.assertEqual(response.status_code, 302)
+        user = User.objects.get(mobile='9000000003')
+        self.assertTrue(user.check_password('01021990'))
+        self.assertEqual(user.patientprofile.name, 'New Patient')
+
+
+class ResetTokensCommandTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('9000000002', password='x')
+        self.patient = PatientProfile.objects.create(
+            user=user, name='Patient', date_of_birth=date(1980, 1, 1), gender='male',
+            contact='9000000002', aadhaar_number='1', address='Address',
+        )
+        self.today = timezone.localdate()
+
+    def book(self, number, days_ago):
+        return Appointment.objects.create(
+            patient=self.patient, appointment_date=self.today - timedelta(days=days_ago),
+            symptom_or_disease='Fever', admission_number=f'ADM{number}', token_number=number,
+        )
+
+    def test_resets_only_past_days_and_is_idempotent(self):
+        past = [self.book(n, days_ago=1) for n in range(1, 6)]
+        older = self.book(7, days_ago=2)
+        current = self.book(6, days_ago=0)
+
+        call_command('reset_tokens', '--batch-size', '2', stdout=StringIO())
+        self.assertEqual(Appointment.objects.filter(pk__in=[a.pk for a in past], token_number=0).count(), 5)
+        current.refresh_from_db()
+        self.assertEqual(current.token_number, 6)
+        older.refresh_from_db()
+        self.assertEqual(older.token_number, 7)  # not yesterday's partition
+
+        out = StringIO()
+        call_command('reset_tokens', stdout=out)
+        self.assertIn('(0 appointments', out.getvalue())
+
+        # The next night only today's partition is touched, not the history.
+        reset_at = dict(Appointment.objects.filter(token_number=0).values_list('pk', 'token_reset_date'))
+        out = StringIO()
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(days=1)):
+            call_command('reset_tokens', stdout=out)
+        self.assertIn('(1 appointments', out.getvalue())
+        current.refresh_from_db()
+        self.assertEqual(current.token_number, 0)
+        for pk, stamp in reset_at.items():
+            self.assertEqual(Appointment.objects.get(pk=pk).token_reset_date, stamp)
+
+    def test_all_catches_up_on_missed_days(self):
+        older = self.book(1, days_ago=3)
+        call_command('reset_tokens', '--all', stdout=StringIO())
+        older.refresh_from_db()
+        self.assertEqual(older.token_number, 0)
+
+    def test_dry_run_writes_nothing(self):
+        self.book(1, days_ago=1)
+        call_command('reset_tokens', '--dry-run', stdout=StringIO())
+        self.assertFalse(Appointment.objects.filter(token_number=0).exists())
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ImportPatientsCommandTests(TestCase):
+    def test_imports_valid_rows_and_reports_rejects(self):
+        User.objects.create_user('9000000009', password='x')
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'patients.csv')
+            rejects = os.path.join(tmp, 'rejects.csv')
+            with open(source, 'w', newline='') as f:
+                f.write(
+                    'name,date_of_birth,contact,gender,is_differently_abled,aadhaar_number,address\n'
+                    'Asha,1990-05-04,9000000010,female,False,111122223333,Chennai\n'
+                    'Ravi,1985-01-02,9000000011,male,True,111122224444,Madurai\n'
+                    'Twin,1985-01-02,9000000012,male,False,111122224444,Madurai\n'
+                    'Taken,1985-01-02,9000000009,male,False,111122225555,Salem\n'
+                    'Bad,not-a-date,9000000013,unknown,False,111122226666,Salem\n'
+                )
+            call_command('import_patients', source, '--workers', '0', '--batch-size', '2',
+                         '--rejects', rejects, stdout=StringIO())
+            with open(rejects) as f:
+                rejected_lines = [row['line'] for row in csv.DictReader(f)]
+
+        self.assertEqual(rejected_lines, ['4', '5', '6'])
+        imported = PatientProfile.objects.order_by('admission_number')
+        self.assertEqual([p.name for p in imported], ['Asha', 'Ravi'])
+        self.assertEqual(imported[0].admission_number[-6:], '000001')
+        self.assertTrue(imported[0].user.check_password('04051990'))
+        self.assertEqual(imported[0].user.role, 'patient')
+
+
+class AppointmentExpiryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('9000000002', password='x')
+        patient = PatientProfile.objects.create(
+            user=self.user, name='Patient', date_of_birth=date(1980, 1, 1), gender='male',
+            contact='9000000002', aadhaar_number='1', address='Address',
+        )
+        self.appointment = Appointment.objects.create(
+            patient=patient, appointment_date=timezone.localdate() - timedelta(days=1),
+            symptom_or_disease='Fever', admission_number='ADM1', token_number=11,
+        )
+
+    def test_patient_home_shows_expired_status_without_writing(self):
+        self.client.force_login(self.user)
+        # Session, user with profile, appointments.
+        with self.assertNumQueries(3):
+            response = self.client.get('/patient/dashboard/')
+        self.assertEqual([a.current_status for a in response.context['appointments']], ['Completed'])
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.status, 'Booked')
+
+    def test_expire_updates_past_bookings_in_bulk(self):
+        self.assertEqual(Appointment.objects.expire(), 1)
+        self.assertEqual(Appointment.objects.expire(), 0)
+
+
+class RecordListingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('9000000001', role='staff', password='x')
+        staff = StaffProfile.objects.create(
+            user=self.user, name='Staff', date_of_birth=date(1985, 1, 1), gender='female',
+            role='doctor', qualification='MBBS', contact='9000000001', address='Address',
+        )
+        patient = PatientProfile.objects.create(
+            user=User.objects.create_user('9000000002', password='x'), name='Patient',
+            date_of_birth=date(1980, 1, 1), gender='male', contact='9000000002',
+            aadhaar_number='1', address='Address',
+        )
+        InpatientRecord.objects.bulk_create([
+            InpatientRecord(patient=patient, bed_number=n, case_type='General', treatment_plan='Rest',
+                            admitted_date=date(2025, 4, 1) + timedelta(days=n % 5), created_by=staff)
+            for n in range(25)
+        ])
+        self.client.force_login(self.user)
+
+    def test_api_cursor_walks_every_record_once(self):
+        seen = []
+        url = '/api/records/inpatients/?limit=10'
+        while url:
+            data = self.client.get(url).json()
+            seen.extend(row['id'] for row in data['results'])
+            url = data['next_cursor'] and f"/api/records/inpatients/?limit=10&cursor={data['next_cursor']}"
+        self.assertEqual(sorted(seen), sorted(InpatientRecord.objects.values_list('id', flat=True)))
+
+    def test_api_rejects_bad_cursor(self):
+        self.assertEqual(self.client.get('/api/records/inpatients/?cursor=nope').status_code, 400)
+        null_cursor = encode_cursor([None, None])
+        self.assertEqual(self.client.get(f'/api/records/inpatients/?cursor={null_cursor}').status_code, 400)
+
+    def test_records_page_query_count_does_not_grow_with_rows(self):
+        with self.assertNumQueries(6):  # session, user, table versions, three pages
+            response = self.client.get('/staff/view-record/')
+        self.assertEqual(len(response.context['all_inpatients']), 25)
+
+    def test_records_page_serves_unchanged_listings_from_cache(self):
+        self.client.get('/staff/view-record/')
+        with self.assertNumQueries(2):  # session, table versions
+            response = self.client.get('/staff/view-record/')
+        self.assertContains(response, '<td>Patient</td>', count=26)
+
+        patient = PatientProfile.objects.get()
+        patient.name = 'Renamed'
+        patient.save()
+        response = self.client.get('/staff/view-record/')
+        self.assertNotContains(response, '<td>Patient</td>')
+        self.assertContains(response, '<td>Renamed</td>', count=26)  # patients table and 25 inpatients
+
+    def test_export_streams_csv_within_date_range(self):
+        response = self.client.get('/staff/export/inpatients/?start=2025-04-02&end=2025-04-03')
+        self.assertTrue(response.streaming)
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(len(rows), 10)
+        self.assertEqual({row['admitted_date'] for row in rows}, {'2025-04-02', '2025-04-03'})
+        self.assertEqual(self.client.get('/staff/export/inpatients/?start=April').status_code, 400)
+
+    async def test_export_streams_asynchronously_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/staff/export/inpatients/?start=2025-04-02&end=2025-04-03')
+        self.assertTrue(response.is_async)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(body.decode().splitlines()), 11)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'query plans are checked on SQLite')
+class QueryPlanTests(TestCase):
+    """Every query the views run must be answered from an index.
+
+    A plan step ``SCAN core_...`` reads a whole table or index. That is only
+    accepted for a keyset page walking an index in its ORDER BY order, which
+    LIMIT cuts short (a LIMIT on its own does not: SQLite may still scan and
+    sort), or for counting whole tables, like the cached dashboard counters,
+    which SQLite answers from the narrowest covering index. Walking a partial
+    index (e.g. open admissions only) is bounded by the subset it covers, and
+    tables holding a handful of configuration rows are exempt.
+    """
+    scan = re.compile(r'\bSCAN (core_\w+)(?: USING (?:COVERING )?INDEX (\w+))?')
+    keyset_page = re.compile(r' ORDER BY .+ LIMIT \d+$')
+    # Ordered by the primary key alone: SQLite walks the table in rowid order.
+    rowid_page = re.compile(r' ORDER BY "core_\w+"\."id" (?:ASC|DESC) LIMIT \d+$')
+    small_tables = {'core_ward'}
+    partial_indexes = {
+        index.name
+        for model in apps.get_app_config('core').get_models()
+        for index in model._meta.indexes
+        if index.condition is not None
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        today = timezone.localdate()
+        cls.admin = User.objects.create_superuser('9000000000', password='x')
+        cls.staff_user = User.objects.create_user('9000000001', role='staff', password='x')
+        staff = StaffProfile.objects.create(
+            user=cls.staff_user, name='Staff', date_of_birth=date(1985, 1, 1), gender='female',
+            role='doctor', qualification='MBBS', contact='9000000001', address='Address',
+        )
+        cls.patient_user = User.objects.create_user('9000000002', password='x')
+        cls.patient = PatientProfile.objects.create(
+            user=cls.patient_user, name='Patient', date_of_birth=date(1950, 1, 1), gender='male',
+            contact='9000000002', aadhaar_number='1', address='Address', admission_number='HOSP012025000001',
+        )
+        InpatientRecord.objects.create(
+            patient=cls.patient, bed_number=1, case_type='General', admitted_date=today,
+            treatment_plan='Rest', created_by=staff,
+        )
+        OutpatientRecord.objects.create(
+            patient=cls.patient, visit_date=today, symptoms='Cough', diagnosis='Cold',
+            prescription='Rest', created_by=staff,
+        )
+        Appointment.objects.create(
+            patient=cls.patient, appointment_date=today, symptom_or_disease='Fever',
+            admission_number='HOSP012025000001', token_number=1,
+        )
+        cls.cursor = encode_cursor([str(today), 10**6])
+
+    def setUp(self):
+        # Cached counters and fragments would hide the queries behind them.
+        for cache in caches.all():
+            cache.clear()
+
+    def full_scans(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            steps = [row[-1] for row in cursor.fetchall()]
+        if 'COUNT(' in sql and ' WHERE ' not in sql:
+            return []
+        walks_index_in_order = (
+            self.keyset_page.search(sql) and not any('TEMP B-TREE' in step for step in steps)
+        )
+        return [
+            step for step in steps
+            if (match := self.scan.search(step))
+            and match.group(1) not in self.small_tables
+            and match.group(2) not in self.partial_indexes
+            and not (walks_index_in_order and (match.group(2) or self.rowid_page.search(sql)))
+        ]
+
+    def assertIndexedQueries(self, user, url):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertLess(response.status_code, 400, url)
+        for query in queries.captured_queries:
+            if query['sql'].startswith('SELECT'):
+                self.assertEqual(self.full_scans(query['sql']), [], f"{url}: {query['sql']}")
+
+    def test_staff_views(self):
+        for url in [
+            '/staff/dashboard/',
+            '/staff/view-record/',
+            '/staff/view-record/?admission_number=HOSP012025000001',
+            f'/staff/view-record/?inpatients_cursor={self.cursor}&outpatients_cursor={self.cursor}',
+            '/staff/add-record/?admission_number=HOSP012025000001',
+            '/staff/today-appointments/',
+            f'/api/records/inpatients/?cursor={self.cursor}',
+        ]:
+            self.assertIndexedQueries(self.staff_user, url)
+
+    def test_patient_home(self):
+        self.assertIndexedQueries(self.patient_user, '/patient/dashboard/')
+
+    def test_admin_dashboard(self):
+        self.assertIndexedQueries(self.admin, '/dashboard/')
+
+
+class CensusTests(TestCase):
+    def setUp(self):
+        self.staff = StaffProfile.objects.create(
+            user=User.objects.create_user('9000000001', role='staff', password='x'), name='Staff',
+            date_of_birth=date(1985, 1, 1), gender='female', role='doctor', qualification='MBBS',
+            contact='9000000001', address='Address',
+        )
+        self.patient = PatientProfile.objects.create(
+            user=User.objects.create_user('9000000002', password='x'), name='Patient',
+            date_of_birth=date(1980, 1, 1), gender='male', contact='9000000002',
+            aadhaar_number='1', address='Address',
+        )
+
+    def admit(self, day, bed):
+        return InpatientRecord.objects.create(
+            patient=self.patient, bed_number=bed, case_type='General', admitted_date=day,
+            treatment_plan='Rest', created_by=self.staff,
+        )
+
+    def visit(self, day):
+        return OutpatientRecord.objects.create(
+            patient=self.patient, visit_date=day, symptoms='Cough', diagnosis='Cold',
+            prescription='Rest', created_by=self.staff,
+        )
+
+    def snapshot(self):
+        # Days a delta brought back to zero keep their row; a rebuild leaves them out.
+        rows = DailyCensus.objects.values_list('date', 'admissions', 'discharges', 'outpatient_visits')
+        return {day: counts for day, *counts in rows if any(counts)}
+
+    def test_signal_deltas_match_a_rebuild(self):
+        day = date(2025, 4, 1)
+        first, second = self.admit(day, 1), self.admit(day + timedelta(days=1), 2)
+        first.admitted_date = day + timedelta(days=2)
+        first.save()
+        first.discharged_date = day + timedelta(days=3)
+        first.save()
+        second.discharged_date = day + timedelta(days=3)
+        second.save()
+        second.discharged_date = day + timedelta(days=4)
+        second.save()
+        kept, dropped = self.visit(day), self.visit(day)
+        kept.visit_date = day + timedelta(days=1)
+        kept.save()
+        dropped.delete()
+        self.admit(day, 3).delete()
+
+        live = self.snapshot()
+        self.assertEqual(live, {
+            day + timedelta(days=1): [1, 0, 1],
+            day + timedelta(days=2): [1, 0, 0],
+            day + timedelta(days=3): [0, 1, 0],
+            day + timedelta(days=4): [0, 1, 0],
+        })
+        call_command('rebuild_census', stdout=StringIO())
+        self.assertEqual(self.snapshot(), live)
+
+    def test_forecast_uses_the_csv_until_enough_days_have_activity(self):
+        predictor.clear_forecasts()
+        yesterday = timezone.now().date() - timedelta(days=1)
+        for n in range(census.MIN_ACTIVE_DAYS - 1):
+            self.visit(yesterday - timedelta(days=n))
+        with mock.patch.object(census, 'train_predict_model', return_value=42) as fallback:
+            self.assertEqual(census.forecast('outpatient_visits', 'seed.csv'), 42)
+            fallback.assert_called_once_with('seed.csv')
+
+            self.visit(yesterday - timedelta(days=census.MIN_ACTIVE_DAYS))
+            end, start = yesterday, yesterday - timedelta(days=census.FORECAST_WINDOW_DAYS - 1)
+            expected = predictor.fit_series(census.series('outpatient_visits', start, end)).prediction
+            self.assertEqual(census.forecast('outpatient_visits', 'seed.csv'), max(0, expected))
+            self.assertEqual(fallback.call_count, 1)
+
+
+class BedOccupancyTests(TestCase):
+    def setUp(self):
+        self.staff = StaffProfile.objects.create(
+            user=User.objects.create_user('9000000001', role='staff', password='x'), name='Staff',
+            date_of_birth=date(1985, 1, 1), gender='female', role='doctor', qualification='MBBS',
+            contact='9000000001', address='Address',
+        )
+        self.patient = PatientProfile.objects.create(
+            user=User.objects.create_user('9000000002', password='x'), name='Patient',
+            date_of_birth=date(1980, 1, 1), gender='male', contact='9000000002',
+            aadhaar_number='1', address='Address',
+        )
+        self.general = Ward.objects.create(name='General')
+        self.icu = Ward.objects.create(name='ICU')
+        for number in (1, 2, 3):
+            Bed.objects.create(ward=self.general, number=number)
+        Bed.objects.create(ward=self.icu, number=10)
+
+    def admit(self, bed_number):
+        return InpatientRecord.objects.create(
+            patient=self.patient, bed_number=bed_number, case_type='General',
+            admitted_date=date(2025, 4, 1), treatment_plan='Rest', created_by=self.staff,
+        )
+
+    def test_admit_move_and_discharge_update_counters(self):
+        record = self.admit(1)
+        self.admit(10)
+        self.assertEqual(beds.occupancy(), {'total': 4, 'occupied': 2, 'free': 2})
+        self.assertEqual(beds.next_free_bed().number, 2)
+
+        record.bed_number = 2
+        record.save()
+        self.assertEqual(beds.next_free_bed().number, 1)
+
+        record.discharged_date = date(2025, 4, 3)
+        record.save()
+        self.assertEqual(
+            [(w['name'], w['free']) for w in beds.free_by_ward()], [('General', 3), ('ICU', 0)]
+        )
+        self.assertIsNone(beds.next_free_bed(self.icu))
+
+    def counters(self):
+        return list(Ward.objects.order_by('name').values_list('name', 'capacity', 'occupied'))
+
+    def test_moving_or_freeing_a_bed_updates_both_wards(self):
+        bed = Bed.objects.get(number=1)
+        bed.occupant = self.admit(5)  # no bed 5, so it is assigned by hand
+        bed.save()
+        bed.ward = self.icu
+        bed.save()
+        self.assertEqual(self.counters(), [('General', 2, 0), ('ICU', 2, 1)])
+        bed.occupant = None
+        bed.save()
+        self.assertEqual(self.counters(), [('General', 2, 0), ('ICU', 2, 0)])
+        beds.rebuild()
+        self.assertEqual(self.counters(), [('General', 2, 0), ('ICU', 2, 0)])
+
+    def test_rebuild_matches_incremental_index(self):
+        first = self.admit(1)
+        self.admit(1)  # waits for bed 1
+        self.admit(3).delete()
+        first.discharged_date = date(2025, 4, 2)
+        first.save()
+        incremental = beds.free_by_ward()
+        beds.rebuild()
+        self.assertEqual(beds.free_by_ward(), incremental)
+        self.assertEqual(beds.occupancy()['occupied'], 1)
+
+
+class DashboardStatsTests(TestCase):
+    def setUp(self):
+        dashboard.invalidate()
+        self.admin = User.objects.create_superuser('9000000000', password='x')
+        self.client.force_login(self.admin)
+
+    def add_staff(self, mobile, role):
+        # The counters are dropped once the write commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            StaffProfile.objects.create(
+                user=User.objects.create_user(mobile, role='staff', password='x'), name='Staff',
+                date_of_birth=date(1985, 1, 1), gender='female', role=role, qualification='MBBS',
+                contact=mobile, address='Address',
+            )
+
+    def test_counts_come_from_one_query(self):
+        self.add_staff('9000000001', 'doctor')
+        self.add_staff('9000000003', 'staff')
+        with self.assertNumQueries(1):
+            counts = dashboard.fetch_counts()
+        self.assertEqual(counts['total_staff'], 2)
+        self.assertEqual(counts['total_doctors'], 1)
+
+    def test_cached_until_a_write_invalidates(self):
+        self.assertEqual(self.client.get('/dashboard/stats/').json()['total_doctors'], 0)
+        with self.assertNumQueries(1):  # session only; the user is cached too
+            self.client.get('/dashboard/stats/')
+        self.add_staff('9000000001', 'doctor')
+        self.assertEqual(self.client.get('/dashboard/stats/').json()['total_doctors'], 1)
+
+    def test_replica_counts_never_reach_primary_readers(self):
+        lagging = {'total_doctors': 0}
+        with mock.patch.object(dashboard.router, 'db_for_read', return_value='replica'), \
+                mock.patch.object(dashboard, 'fetch_counts', return_value=lagging), \
+                mock.patch.object(dashboard.beds, 'occupancy', return_value={}):
+            self.assertEqual(dashboard.get_dashboard_stats()['total_doctors'], 0)
+        self.add_staff('9000000001', 'doctor')
+        with mock.patch.object(dashboard.router, 'db_for_read', return_value='replica'), \
+                mock.patch.object(dashboard, 'fetch_counts', return_value=lagging), \
+                mock.patch.object(dashboard.beds, 'occupancy', return_value={}):
+            dashboard.get_dashboard_stats()  # refilled from the lagging replica
+        self.assertEqual(dashboard.get_dashboard_stats()['total_doctors'], 1)
+
+
+class QueueEventTests(TestCase):
+    def test_one_publish_reaches_every_stream(self):
+        broker = LocalBroker()
+
+        async def run():
+            streams = [event_stream('queue:test', broker=broker) for _ in range(3)]
+            for stream in streams:
+                self.assertEqual(await anext(stream), 'retry: 3000\n\n')
+            frames = [asyncio.ensure_future(anext(stream)) for stream in streams]
+            await asyncio.sleep(0)
+            self.assertEqual(broker.publish('queue:test', 'event: booked\ndata: {}\n\n'), 3)
+            received = await asyncio.gather(*frames)
+            for stream in streams:
+                await stream.aclose()
+            return received
+
+        self.assertEqual(asyncio.run(run()), ['event: booked\ndata: {}\n\n'] * 3)
+        self.assertEqual(broker.subscriber_count('queue:test'), 0)
+
+    def test_patients_cannot_change_appointment_status(self):
+        patient = PatientProfile.objects.create(
+            user=User.objects.create_user('9000000002', password='x'), name='Patient',
+            date_of_birth=date(1980, 1, 1), gender='male', contact='9000000002',
+            aadhaar_number='1', address='Address', admission_number='HOSP012025000001',
+        )
+        appointment = Appointment.objects.create(
+            patient=patient, appointment_date=date.today(),
+            symptom_or_disease='Fever', admission_number='ADM1', token_number=1,
+        )
+        self.client.force_login(patient.user)
+        response = self.client.post(f'/staff/appointments/{appointment.pk}/complete/')
+        self.assertEqual(response.status_code, 403)
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.status, 'Booked')
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        staff = StaffProfile.objects.create(
+            user=User.objects.create_user('9000000001', role='staff', password='x'), name='Staff',
+            date_of_birth=date(1985, 1, 1), gender='female', role='doctor', qualification='MBBS',
+            contact='9000000001', address='Address',
+        )
+        patient = PatientProfile.objects.create(
+            user=User.objects.create_user('9000000002', password='x'), name='Patient',
+            date_of_birth=date(1980, 1, 1), gender='male', contact='9000000002',
+            aadhaar_number='1', address='Address',
+        )
+        self.visit = OutpatientRecord.objects.create(
+            patient=patient, visit_date=date(2025, 4, 1), symptoms='Dry cough and fever',
+            diagnosis='Bronchitis', prescription='Azithromycin', created_by=staff,
+        )
+        self.admission = InpatientRecord.objects.create(
+            patient=patient, bed_number=1, case_type='Cardiac', admitted_date=date(2025, 4, 1),
+            treatment_plan='Monitor fever, daily ECG', created_by=staff,
+        )
+
+    def assertFinds(self, query, expected, **kwargs):
+        found = [(result.kind, result.object.pk) for result in search.search(query, **kwargs)]
+        self.assertCountEqual(found, expected)
+
+    def check_backend(self, prefix_matching):
+        self.assertFinds('fever', [('outpatient', self.visit.pk), ('inpatient', self.admission.pk)])
+        self.assertFinds('cough fever', [('outpatient', self.visit.pk)])
+        self.assertFinds('fever', [('inpatient', self.admission.pk)], kinds=['inpatient'])
+        self.assertFinds('azithro', [('outpatient', self.visit.pk)] if prefix_matching else [])
+
+        self.visit.diagnosis = 'Pneumonia'
+        self.visit.save()
+        self.assertFinds('bronchitis', [])
+        self.assertFinds('pneumonia', [('outpatient', self.visit.pk)])
+        self.admission.delete()
+        self.assertFinds('fever', [('outpatient', self.visit.pk)])
+
+    def test_fts5_backend(self):
+        if search.get_backend().name != 'fts5':
+            self.skipTest('SQLite FTS5 is not available')
+        self.check_backend(prefix_matching=True)
+
+    @override_settings(HMS_SEARCH_BACKEND='postings')
+    def test_postings_backend(self):
+        search.rebuild()
+        self.check_backend(prefix_matching=False)
+
+    def test_document_total_is_counted_once_per_change(self):
+        self.assertEqual(search.document_total(), 2)
+        with self.assertNumQueries(1):  # the table versions
+            self.assertEqual(search.document_total(), 2)
+        self.admission.delete()
+        self.assertEqual(search.document_total(), 1)
+
+    def test_results_are_paginated(self):
+        for _ in range(3):
+            OutpatientRecord.objects.create(
+                patient=self.visit.patient, visit_date=date(2025, 4, 2), symptoms='Fever',
+                diagnosis='Viral', prescription='Rest', created_by=self.visit.created_by,
+            )
+        first = search.search('fever', page_size=4)
+        second = search.search('fever', page=2, page_size=4)
+        self.assertTrue(first.has_next)
+        self.assertEqual((len(first), len(second), second.has_next), (4, 1, False))
+
+
+class PatientLookupTests(TestCase):
+    def setUp(self):
+        self.ravi = PatientProfile.objects.create(
+            user=User.objects.create_user('9876543210', password='x'), name='Ravi Kumar',
+            date_of_birth=date(1980, 1, 1), gender='male', contact='9876543210',
+            aadhaar_number='123412341234', address='Address', admission_number='HOSP012025000007',
+        )
+        self.revathi = PatientProfile.objects.create(
+            user=User.objects.create_user('9123456780', password='x'), name='Revathi Srinivasan',
+            date_of_birth=date(1990, 1, 1), gender='female', contact='9123456780',
+            aadhaar_number='999988887777', address='Address', admission_number='HOSP012025000008',
+        )
+
+    def found(self, query):
+        return [result['id'] for result in lookup.lookup(query)]
+
+    def test_prefix_matches_every_field(self):
+        self.assertEqual(self.found('ra'), [self.ravi.pk])
+        self.assertEqual(self.found('kum'), [self.ravi.pk])
+        self.assertEqual(self.found('98765 43'), [self.ravi.pk])
+        self.assertEqual(self.found('9999'), [self.revathi.pk])
+        self.assertEqual(self.found('hosp012025000008'), [self.revathi.pk])
+        self.assertCountEqual(self.found('hosp01'), [self.ravi.pk, self.revathi.pk])
+
+    def test_migration_writes_the_same_keys_as_the_signals(self):
+        migration = importlib.import_module('core.migrations.0009_patient_lookup_keys')
+        live = set(PatientLookupKey.objects.values_list('patient_id', 'field', 'key'))
+        PatientLookupKey.objects.all().delete()
+        with mock.patch.object(migration, 'BATCH_SIZE', 1):
+            migration.index_existing_patients(apps, None)
+        self.assertEqual(set(PatientLookupKey.objects.values_list('patient_id', 'field', 'key')), live)
+
+    def test_typos_in_names_still_match(self):
+        self.assertEqual(self.found('Revathy'), [self.revathi.pk])
+        self.assertEqual(self.found('Srinviasan'), [self.revathi.pk])
+        self.assertFalse(lookup.lookup('Revathy')[0]['exact'])
+
+    def test_edits_and_deletes_invalidate_cached_results(self):
+        self.assertEqual(self.found('ravi'), [self.ravi.pk])
+        self.ravi.name = 'Ravindran'
+        self.ravi.save()
+        self.assertEqual(lookup.lookup('ravi')[0]['name'], 'Ravindran')
+        self.ravi.delete()
+        self.assertEqual(self.found('ravi'), [])
+
+    def test_api_requires_staff(self):
+        self.client.force_login(self.ravi.user)
+        self.assertEqual(self.client.get('/api/patients/lookup/?q=ra').status_code, 404)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.registry.reset()
+        self.admin = User.objects.create_superuser('9000000000', password='x')
+
+    def test_requests_are_recorded_per_view(self):
+        self.client.force_login(self.admin)
+        response = self.client.get('/dashboard/stats/')
+        self.assertIn('queries', response['Server-Timing'])
+        stats = dict(metrics.registry.views())['dashboard_stats']
+        self.assertEqual(stats.requests, 1)
+        self.assertEqual(stats.response_bytes, len(response.content))
+        self.assertGreater(stats.queries.total, 0)
+
+        text = self.client.get('/metrics/').content.decode()
+        self.assertIn('hms_request_duration_ms_count{view="dashboard_stats"} 1', text)
+        self.assertIn('hms_requests_total{view="dashboard_stats",method="GET",status="200"} 1', text)
+        self.assertEqual(self.client.get('/metrics/panel/').status_code, 200)
+
+    async def test_async_requests_are_recorded(self):
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get('/dashboard/stats/')
+        self.assertIn('queries', response['Server-Timing'])
+        stats = dict(metrics.registry.views())['dashboard_stats']
+        self.assertEqual(stats.requests, 1)
+        self.assertGreater(stats.queries.total, 0)
+
+    def test_repeated_queries_are_flagged(self):
+        recorder = metrics.QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for pk in range(4):
+                PatientProfile.objects.filter(pk=pk).exists()
+            User.objects.count()
+        for _ in range(3):
+            recorder(lambda *args: None, 'BEGIN', None, False, {})
+        [(sql, times)] = recorder.duplicates(3)
+        self.assertEqual(times, 4)
+        self.assertIn('core_patientprofile', sql)
+
+    @override_settings(HMS_PROFILE_SAMPLE_RATE=1)
+    def test_sampled_requests_are_profiled(self):
+        metrics.profiles.clear()
+        self.client.get('/')
+        self.assertEqual(metrics.profiles[0]['view'], 'home')
+        self.assertIn('function calls', metrics.profiles[0]['report'])
+
+    def test_every_route_has_a_benchmark_scenario(self):
+        self.assertEqual(set(routes()) - set(SCENARIOS), set())
+
+
+class CachedUserTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('9000000001', role='staff', password='x')
+        self.staff = StaffProfile.objects.create(
+            user=self.user, name='Staff', date_of_birth=date(1985, 1, 1), gender='female',
+            role='doctor', qualification='MBBS', contact='9000000001', address='Address',
+        )
+        self.client.force_login(self.user)
+
+    def test_user_and_profile_come_from_one_cached_query(self):
+        with self.assertNumQueries(2):  # session, then user joined with profiles
+            self.client.get('/staff/dashboard/')
+        with self.assertNumQueries(1):
+            response = self.client.get('/staff/dashboard/')
+        self.assertEqual(response.context['staff'].name, 'Staff')
+
+    def test_profile_changes_are_seen_on_the_next_request(self):
+        self.client.get('/staff/dashboard/')
+        self.staff.name = 'Renamed'
+        self.staff.save()
+        self.assertEqual(self.client.get('/staff/dashboard/').context['staff'].name, 'Renamed')
+
+    def test_password_change_ends_cached_sessions(self):
+        self.client.get('/staff/dashboard/')
+        self.user.set_password('changed')
+        self.user.save()
+        response = self.client.get('/staff/dashboard/')
+        self.assertRedirects(response, '/login/?next=/staff/dashboard/', fetch_redirect_response=False)
+
+    def test_non_staff_are_not_staff(self):
+        self.assertIsNone(accounts.staff_profile(User.objects.create_user('9000000002', password='x')))
+
+    def test_deploy_check_requires_a_shared_user_cache(self):
+        self.assertEqual([w.id for w in checks.check_user_cache_is_shared(None)], ['core.W001'])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://'}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(checks.check_user_cache_is_shared(None), [])
+
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('9000000001', role='staff', password='x')
+        self.staff = StaffProfile.objects.create(
+            user=self.user, name='Staff', date_of_birth=date(1985, 1, 1), gender='female',
+            role='doctor', qualification='MBBS', contact='9000000001', address='Address',
+        )
+        self.patient = PatientProfile.objects.create(
+            user=User.objects.create_user('9000000002', password='x'), name='Patient',
+            date_of_birth=date(1980, 1, 1), gender='male', contact='9000000002',
+            aadhaar_number='1', address='Address', admission_number='HOSP012025000001',
+        )
+        self.client.force_login(self.user)
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_queue_is_not_modified(self):
+        first = self.client.get('/staff/today-appointments/')
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('Last-Modified', first)
+        self.assertIn('private', first['Cache-Control'])
+        with self.assertNumQueries(2):  # session, table versions
+            response = self.revalidate('/staff/today-appointments/', first)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        Appointment.objects.create(
+            patient=self.patient, appointment_date=date.today(),
+            symptom_or_disease='Fever', admission_number='ADM1', token_number=1,
+        )
+        response = self.revalidate('/staff/today-appointments/', first)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Patient')
+
+    def test_queue_actions_follow_the_status(self):
+        Appointment.objects.create(
+            patient=self.patient, appointment_date=date.today(), status='Called',
+            symptom_or_disease='Fever', admission_number='ADM1', token_number=1,
+        )
+        response = self.client.get('/staff/today-appointments/')
+        self.assertContains(response, 'class="d-inline queue-call d-none"', count=1)
+        self.assertContains(response, 'class="d-inline queue-complete"', count=2)
+        # The template cloned for rows added by live updates carries the CSRF token.
+        template = response.content.decode().split('<template id="queue-actions">')[1].split('</template>')[0]
+        self.assertIn('/staff/appointments/0/call/', template)
+        self.assertEqual(template.count('csrfmiddlewaretoken'), 2)
+
+    def test_new_csrf_secret_or_session_changes_the_etag(self):
+        first = self.client.get('/staff/today-appointments/')
+        self.client.cookies['csrftoken'] = 'a' * 32
+        self.assertEqual(self.revalidate('/staff/today-appointments/', first).status_code, 200)
+
+        second = self.client.get('/staff/today-appointments/')
+        self.client.logout()
+        self.client.force_login(self.user)  # a new session, as after logging in again
+        self.assertEqual(self.revalidate('/staff/today-appointments/', second).status_code, 200)
+
+    def test_records_etag_depends_on_query_and_tables(self):
+        first = self.client.get('/staff/view-record/')
+        self.assertEqual(self.revalidate('/staff/view-record/', first).status_code, 304)
+        self.assertEqual(self.revalidate('/staff/view-record/?admission_number=x', first).status_code, 200)
+        self.patient.name = 'Renamed'
+        self.patient.save()
+        self.assertEqual(self.revalidate('/staff/view-record/', first).status_code, 200)
+
+    def test_staff_home_changes_with_the_profile(self):
+        first = self.client.get('/staff/dashboard/')
+        self.assertEqual(self.revalidate('/staff/dashboard/', first).status_code, 304)
+        self.staff.name = 'Renamed'
+        self.staff.save()
+        self.assertContains(self.revalidate('/staff/dashboard/', first), 'Renamed')
+
+class SessionModeTests(TestCase):
+    def test_unknown_mode_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            sessions.session_engine('memcached')
+
+    def test_cache_and_cookie_sessions_skip_the_session_table(self):
+        user = User.objects.create_user('9000000001', role='staff', password='x')
+        StaffProfile.objects.create(
+            user=user, name='Staff', date_of_birth=date(1985, 1, 1), gender='female',
+            role='doctor', qualification='MBBS', contact='9000000001', address='Address',
+        )
+        for mode in ('cache', 'cached_db', 'signed_cookies'):
+            with self.subTest(mode=mode), override_settings(SESSION_ENGINE=sessions.session_engine(mode)):
+                client = self.client_class()  # SessionMiddleware picks its engine once per client
+                client.force_login(user)
+                client.get('/staff/dashboard/')  # fills the user cache
+                with self.assertNumQueries(0):
+                    response = client.get('/staff/dashboard/')
+                self.assertTrue(response.wsgi_request.user.is_authenticated)
@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max
+
+from .models import Appointment, TokenDispenser
+
+
+def priority_slots():
+    """Token numbers 1..N of each day are reserved for priority patients."""
+    return getattr(settings, 'HMS_PRIORITY_TOKEN_SLOTS', 10)
+
+
+def _issued_max(day, queue, slots):
+    # Highest token already issued from this queue today, for days that
+    # started before the dispenser row existed.
+    tokens = Appointment.objects.filter(appointment_date=day)
+    if queue == 'priority':
+        tokens = tokens.filter(token_number__lte=slots)
+    else:
+        tokens = tokens.filter(token_number__gt=slots)
+    return tokens.aggregate(Max('token_number'))['token_number__max']
+
+
+def _create_dispenser(day, queue, slots):
+    start = _issued_max(day, queue, slots) or (0 if queue == 'priority' else slots)
+    try:
+        with transaction.atomic():
+            TokenDispenser.objects.create(day=day, queue=queue, last_token=start)
+    except IntegrityError:
+        pass  # created concurrently by another booking
+
+
+def _take(day, queue, slots, limit=None):
+    """Increment the ``queue`` counter for ``day`` and return the new token.
+
+    Returns ``None`` when the counter has reached ``limit``. The conditional
+    UPDATE runs first so the transaction holds the write lock before it reads
+    the counter back.
+    """
+    with transaction.atomic():
+        counter = TokenDispenser.objects.filter(day=day, queue=queue)
+        available = counter if limit is None else counter.filter(last_token__lt=limit)
+        if not available.update(last_token=F('last_token') + 1):
+            if counter.exists():
+                return None
+            _create_dispenser(day, queue, slots)
+            if not available.update(last_token=F('last_token') + 1):
+                return None
+        return counter.values_list('last_token', flat=True).get()
+
+
+def dispense_token(day, is_priority):
+    """Hand out the next token for ``day``.
+
+    Priority patients get the reserved low numbers while they last and join
+    the normal queue after that; normal tokens start after the reserved block.
+    """
+    slots = priority_slots()
+    if is_priority:
+        token = _take(day, 'priority', slots, limit=slots)
+        if token is not None:
+            return token
+    return _take(day, 'normal', slots)
+
+
+def purge_dispensers(before):
+    """Delete counters for days before ``before``; returns the number removed."""
+    deleted, _ = TokenDispenser.objects.filter(day__lt=before).delete()
+    return deleted
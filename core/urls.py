@@ -18,5 +18,14 @@ path('staff/delete-outpatient/<int:id>/', views.delete_outpatient, name='delete_
 path('staff/edit-inpatient/<int:id>/', views.edit_inpatient, name='edit_inpatient'),
 path('staff/delete-inpatient/<int:id>/', views.delete_inpatient, name='delete_inpatient'),
     path('staff/today-appointments/', views.today_appointments, name='today_appointments'),
+    path('staff/today-appointments/stream/', views.queue_stream, name='queue_stream'),
+    path('staff/appointments/<int:id>/call/', views.set_appointment_status, {'status': 'Called'}, name='call_appointment'),
+    path('staff/appointments/<int:id>/complete/', views.set_appointment_status, {'status': 'Completed'}, name='complete_appointment'),
+    path('api/records/<str:kind>/', views.records_api, name='records_api'),
+    path('staff/export/<str:kind>/', views.export_records, name='export_records'),
+    path('staff/search/', views.search_records, name='search_records'),
+    path('api/patients/lookup/', views.patient_lookup, name='patient_lookup'),
+    path('metrics/', views.metrics_endpoint, name='metrics'),
+    path('metrics/panel/', views.metrics_panel, name='metrics_panel'),
     
 ]
@@ -0,0 +1,127 @@
+"""Per-table change counters, for caching what is rendered from the tables.
+
+Each listed table has a :class:`~core.models.TableVersion` row. The signal
+handlers in ``core.signals`` bump it whenever one of the table's rows is
+saved or deleted, and the bulk commands bump it themselves because bulk
+writes skip the signals. A cached fragment whose key includes the counter
+can't outlive a change: the next render asks for a key that is not in the
+cache yet. The counters are stored in the database, so every worker sees a
+bump made by any other, whatever the cache backend.
+
+The same counters make ETags for pages that are polled. See :func:`conditional`.
+"""
+import hashlib
+from collections import namedtuple
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.middleware.csrf import get_token
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .models import Appointment, InpatientRecord, OutpatientRecord, PatientProfile, TableVersion
+
+TABLES = {
+    PatientProfile: 'patients',
+    InpatientRecord: 'inpatients',
+    OutpatientRecord: 'outpatients',
+    Appointment: 'appointments',
+}
+
+
+def bump(*tables):
+    """Advance the counter of each named table."""
+    for table in tables:
+        changes = {'version': F('version') + 1, 'updated_at': timezone.now()}
+        if TableVersion.objects.filter(table=table).update(**changes):
+            continue
+        try:
+            with transaction.atomic():
+                TableVersion.objects.create(table=table, version=1)
+        except IntegrityError:
+            # Another writer created the row first.
+            TableVersion.objects.filter(table=table).update(**changes)
+
+
+def bump_model(model):
+    bump(TABLES[model])
+
+
+class Version(namedtuple('Version', ['number', 'updated_at'])):
+    """A table's counter and when it last moved.
+
+    As a cache key it includes the time too, so a counter that starts over
+    (a restored database, say) cannot match fragments cached before.
+    """
+    __slots__ = ()
+
+    def __str__(self):
+        return f"{self.number}.{self.updated_at.timestamp() if self.updated_at else 0}"
+
+
+def current(*tables):
+    """``{table: Version}`` for the named tables, in one query. Unseen tables are at 0."""
+    versions = dict.fromkeys(tables, Version(0, None))
+    rows = TableVersion.objects.filter(table__in=tables).values_list('table', 'version', 'updated_at')
+    versions.update((table, Version(number, updated_at)) for table, number, updated_at in rows)
+    return versions
+
+
+def for_request(request, *tables):
+    """:func:`current`, looked up once per request and set of tables."""
+    seen = request.__dict__.setdefault('_table_versions', {})
+    if tables not in seen:
+        seen[tables] = current(*tables)
+    return seen[tables]
+
+
+def conditional(*tables, vary=None, since=None):
+    """Answer GETs with ``304 Not Modified`` while nothing the page shows has changed.
+
+    The ETag hashes the version tokens of ``tables``, the user, the session
+    and CSRF secret (pages carry CSRF tokens, and login rotates both), and
+    whatever ``vary(request, *args, **kwargs)`` returns (the query string, say).
+    Last-Modified is the latest change to ``tables``, but never earlier than
+    ``since(request)``. The view only runs when the client's copy is stale.
+    Responses are marked ``private, no-cache``, so browsers revalidate on
+    every poll instead of guessing a freshness lifetime.
+    """
+    def etag(request, *args, **kwargs):
+        # Make the CSRF secret now, so a first response's ETag already
+        # matches the cookie it sets.
+        get_token(request)
+        parts = [
+            request.user.pk, request.session.session_key, request.META['CSRF_COOKIE'],
+            *for_request(request, *tables).values(),
+        ]
+        if vary is not None:
+            parts.append(vary(request, *args, **kwargs))
+        return hashlib.md5('|'.join(map(str, parts)).encode(), usedforsecurity=False).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        stamps = [version.updated_at for version in for_request(request, *tables).values() if version.updated_at]
+        if since is not None:
+            stamps.append(since(request))
+        return max(stamps, default=None)
+
+    def decorator(view):
+        conditional_view = condition(etag, last_modified if tables or since else None)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def fragment_settings():
+    """Template context for ``{% cache fragment_ttl ... using=fragment_cache %}``."""
+    return {
+        'fragment_cache': getattr(settings, 'HMS_FRAGMENT_CACHE', 'default'),
+        'fragment_ttl': getattr(settings, 'HMS_FRAGMENT_CACHE_TTL', 600),
+    }
@@ -1,53 +1,34 @@
+import tempfile
 import uuid
-from datetime import date, timedelta
+from datetime import date
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
-from django.db.models import Count
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
 from django.utils.timezone import now
-from django.contrib.auth import authenticate, login, logout
+from asgiref.sync import sync_to_async
+from django.contrib.auth import alogin, logout
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Max
 from django.utils import timezone
-from datetime import datetime
-from .models import User, PatientProfile, Appointment, StaffProfile, InpatientRecord, OutpatientRecord
+from django.utils.dateparse import parse_date
+from django.utils.functional import SimpleLazyObject
+from .models import User, PatientProfile, Appointment, InpatientRecord, OutpatientRecord
 from .forms import PatientRegisterForm, LoginForm, AppointmentForm, StaffRegistrationForm,InpatientForm,OutpatientForm
 from django.contrib.auth.decorators import user_passes_test
-from .predictor import train_predict_model 
-def generate_admission_number():
-    hospital_code="HOSP01"
-    current_year = datetime.now().year
-    year_str = str(current_year)
-
-    # Step 1: Filter existing admission numbers for the hospital and current year
-    existing_numbers = PatientProfile.objects.filter(
-        admission_number__startswith=f"{hospital_code}{year_str}"
-    ).values_list('admission_number', flat=True)
-
-    # Step 2: Extract and find the highest serial number
-    last_serial = 0
-    for adm_num in existing_numbers:
-        try:
-            serial = int(adm_num[-6:])  # last 6 digits
-            if serial > last_serial:
-                last_serial = serial
-        except ValueError:
-            continue  # skip malformed ones
-
-    # Step 3: Increment and format
-    new_serial = last_serial + 1
-    serial_str = str(new_serial).zfill(6)
-
-    # Step 4: Return new admission number
-    return f"{hospital_code}{year_str}{serial_str}"
+from hospital_system.routers import reporting_view
+from .predictor import INPATIENT_CSV, OUTPATIENT_CSV
+from . import accounts, census, dashboard, exports, lookup, metrics, passwords, queue_events, search, versions, writer
+from .sequences import HOSPITAL_CODE, allocate_admission_numbers
+from .tokens import dispense_token
+from .pagination import DEFAULT_PAGE_SIZE, InvalidCursor, paginate, paginate_request
+def generate_admission_number(hospital_code=HOSPITAL_CODE):
+    return allocate_admission_numbers(1, hospital_code)[0]
 
 
 def get_next_token(is_priority):
-    if is_priority:
-        max_priority = Appointment.objects.filter(is_priority=True).aggregate(Max('token_number'))['token_number__max']
-        return (max_priority or 0) + 1 if (max_priority or 0) < 10 else get_next_token(False)
-    else:
-        max_normal = Appointment.objects.filter(is_priority=False).aggregate(Max('token_number'))['token_number__max'] or 10
-        return max_normal + 1
+    return dispense_token(timezone.now().date(), is_priority)
 
 
 def calculate_age(dob):
@@ -55,45 +36,49 @@ def calculate_age(dob):
     return today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
 
 
-def patient_register(request):
+async def patient_register(request):
     if request.method == 'POST':
         form = PatientRegisterForm(request.POST)
-        if form.is_valid():
+        if await sync_to_async(form.is_valid)():
             # Step 1: Create the user
             dob = form.cleaned_data['date_of_birth']
             password = dob.strftime('%d%m%Y')
-            user = User.objects.create_user(
+            user = User(
                 mobile=form.cleaned_data['contact'],  # assuming this maps to mobile
-                password=password,  # use a secure password system later
                 role='patient'
             )
+            # Hashed in the pool rather than in the writer so it never holds up other writes.
+            user.password = await passwords.amake_password(password)
 
             # Step 2: Create the PatientProfile instance
             patient_profile = form.save(commit=False)
-            patient_profile.user = user
-            
-            patient_profile.admission_number = generate_admission_number()
-            # Optional but good: calculate and assign age
-            
 
-            # Save the profile
-            patient_profile.save()
+            def register():
+                user.save()
+                patient_profile.user = user
+                patient_profile.admission_number = generate_admission_number()
+                # Optional but good: calculate and assign age
+
+                # Save the profile
+                patient_profile.save()
+
+            await sync_to_async(writer.run)(register)
 
             return redirect('login')
     else:
         form = PatientRegisterForm()
 
-    return render(request, 'register.html', {'form': form})
+    return await sync_to_async(render)(request, 'register.html', {'form': form})
 
-def user_login(request):
+async def user_login(request):
     if request.method == 'POST':
         form = LoginForm(request.POST)
         if form.is_valid():
             mobile = form.cleaned_data['mobile']
             password = form.cleaned_data['password']
-            user = authenticate(request, mobile=mobile, password=password)
+            user = await passwords.aauthenticate(request, mobile=mobile, password=password)
             if user:
-                login(request, user)
+                await alogin(request, user)
                 if user.role == 'patient':
                     return redirect('patient_home')
                 elif user.role == 'staff':
@@ -104,7 +89,7 @@ def user_login(request):
                 messages.error(request, "Invalid login credentials")
     else:
         form = LoginForm()
-    return render(request, 'login.html', {'form': form})
+    return await sync_to_async(render)(request, 'login.html', {'form': form})
 
 
 @login_required
@@ -112,29 +97,23 @@ def patient_home(request):
     if not request.user.is_authenticated:
         return render(request, 'welcome')
 
-    profile = PatientProfile.objects.get(user=request.user)
+    profile = request.user.patientprofile
     age = calculate_age(profile.date_of_birth)
-    appointments = Appointment.objects.filter(patient=profile).order_by('-appointment_date')
-    today = timezone.now().date()
-    for appointment in appointments:
-        if appointment.appointment_date < today:
-            if appointment.status != 'Completed':  # Check if status is already 'Completed'
-                appointment.status = 'Completed'
-                appointment.save()
+    # Past bookings are shown as Completed at query time; expire_appointments
+    # persists that in bulk, so viewing the page never writes.
+    appointments = (
+        Appointment.objects.filter(patient=profile)
+        .select_related('patient')
+        .with_current_status()
+        .order_by('-appointment_date')
+    )
     if request.method == 'POST':
         form = AppointmentForm(request.POST)
         if form.is_valid():
             today = timezone.now().date()
-            already_booked = Appointment.objects.filter(patient=profile, appointment_date=today).exists()
-        
-            if already_booked:
-                messages.warning(request, "You already have an appointment for today.")
-                
-                return redirect('patient_home')
-           
             appointment = form.save(commit=False)
             appointment.patient = profile
-            appointment.appointment_date = timezone.now().date()
+            appointment.appointment_date = today
             appointment.admission_number = profile.admission_number
             is_pregnant = form.cleaned_data.get('is_pregnant', False)
             is_differently_abled = form.cleaned_data.get('is_differently_abled', False)
@@ -142,9 +121,21 @@ def patient_home(request):
 
             appointment.age = age
             appointment.is_priority = is_priority
-            appointment.token_number = get_next_token(is_priority)
             appointment.status = 'Booked'
-            appointment.save()
+
+            def book():
+                # Checked in the same transaction as the insert, so two
+                # simultaneous submissions cannot both book.
+                if Appointment.objects.filter(patient=profile, appointment_date=today).exists():
+                    return False
+                appointment.token_number = get_next_token(is_priority)
+                appointment.save()
+                return True
+
+            if not writer.run(book):
+                messages.warning(request, "You already have an appointment for today.")
+                
+                return redirect('patient_home')
 
             messages.success(request, f"Appointment booked! Your token number is {appointment.token_number}")
             return redirect('patient_home')
@@ -165,48 +156,83 @@ def patient_home(request):
 
 # Only allow admin users to access
 def is_admin(user):
-    return user.role == 'admin'
+    return user.is_authenticated and user.role == 'admin'
 
 @user_passes_test(is_admin)
-def register_staff(request):
+async def register_staff(request):
     if request.method == 'POST':
         form = StaffRegistrationForm(request.POST)
-        if form.is_valid():
+        if await sync_to_async(form.is_valid)():
             # Step 1: Create user from staff contact as mobile
             dob = form.cleaned_data['date_of_birth']
             password = dob.strftime('%d%m%Y')
             mobile = form.cleaned_data['contact']
 
-            user = User.objects.create_user(
+            user = User(
                 mobile=mobile,
-                password=password,
+                password=await passwords.amake_password(password),
                 role='staff'
             )
 
             # Step 2: Create staff profile and link user
             staff = form.save(commit=False)
-            staff.user = user
-            staff.save()
+
+            def register():
+                user.save()
+                staff.user = user
+                staff.save()
+
+            await sync_to_async(writer.run)(register)
 
             return redirect('admin_dashboard')
     else:
         form = StaffRegistrationForm()
-    return render(request, 'register_staff.html', {'form': form})
-
+    return await sync_to_async(render)(request, 'register_staff.html', {'form': form})
+
+# Staff listings: queryset factory, keyset ordering (ending with the primary
+# key so cursors are stable) and the fields exposed by records_api.
+RECORD_LISTINGS = {
+    'patients': (
+        lambda: PatientProfile.objects.all(),
+        ('pk',),
+        ('id', 'name', 'date_of_birth', 'gender', 'contact', 'address', 'aadhaar_number', 'admission_number'),
+    ),
+    'inpatients': (
+        lambda: InpatientRecord.objects.select_related('patient', 'created_by'),
+        ('-admitted_date', '-pk'),
+        ('id', 'patient_id', 'patient__name', 'patient__admission_number', 'bed_number', 'case_type',
+         'admitted_date', 'discharged_date', 'treatment_plan', 'created_by__name'),
+    ),
+    'outpatients': (
+        lambda: OutpatientRecord.objects.select_related('patient', 'created_by'),
+        ('-visit_date', '-pk'),
+        ('id', 'patient_id', 'patient__name', 'patient__admission_number', 'visit_date', 'symptoms',
+         'diagnosis', 'prescription', 'next_visit_date', 'created_by__name'),
+    ),
+}
+
+def paginate_listing(request, kind):
+    queryset, ordering, _ = RECORD_LISTINGS[kind]
+    return paginate_request(request, queryset(), ordering, f'{kind}_cursor')
+
+@reporting_view
 @login_required
 @login_required
+@versions.conditional('patients', 'inpatients', 'outpatients', vary=lambda request: request.GET.urlencode())
 def view_patient_records(request):
-    staff = StaffProfile.objects.get(user=request.user)
+    staff = request.user.staffprofile
     query = request.GET.get('admission_number', '')
     
     inpatients = outpatients = []
-    patients = PatientProfile.objects.all()
-    all_inpatients=InpatientRecord.objects.all()
-    all_outpatients=OutpatientRecord.objects.all()
+    # The listings are cached as template fragments keyed by table_versions;
+    # each page is only fetched if its fragment has to be rendered.
+    patients = SimpleLazyObject(lambda: paginate_listing(request, 'patients'))
+    all_inpatients = SimpleLazyObject(lambda: paginate_listing(request, 'inpatients'))
+    all_outpatients = SimpleLazyObject(lambda: paginate_listing(request, 'outpatients'))
     # age = calculate_age(patients.date_of_birth)
     if query:
-        inpatients = InpatientRecord.objects.filter(patient__admission_number=query, created_by=staff).order_by('-admitted_date')
-        outpatients = OutpatientRecord.objects.filter(patient__admission_number=query, created_by=staff).order_by('-visit_date')
+        inpatients = InpatientRecord.objects.filter(patient__admission_number=query, created_by=staff).select_related('patient').order_by('-admitted_date')
+        outpatients = OutpatientRecord.objects.filter(patient__admission_number=query, created_by=staff).select_related('patient').order_by('-visit_date')
         
     return render(request, 'patient_records.html', {
         'staff': staff,
@@ -214,10 +240,110 @@ def view_patient_records(request):
         'inpatients': inpatients,
         'outpatients': outpatients,
         'all_inpatients': all_inpatients,
-        'all_outpatients': all_outpatients
-        
+        'all_outpatients': all_outpatients,
+        'table_versions': versions.for_request(request, 'patients', 'inpatients', 'outpatients'),
+        **versions.fragment_settings(),
     })
 
+@reporting_view
+@login_required
+def records_api(request, kind):
+    """JSON listing of patients or clinical records, one keyset page at a time."""
+    if kind not in RECORD_LISTINGS or accounts.staff_profile(request.user) is None:
+        return JsonResponse({'error': 'not found'}, status=404)
+    queryset, ordering, fields = RECORD_LISTINGS[kind]
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer'}, status=400)
+    try:
+        page = paginate(queryset().values(*fields), ordering, request.GET.get('cursor'), limit)
+    except InvalidCursor:
+        return JsonResponse({'error': 'invalid cursor'}, status=400)
+    return JsonResponse({'results': page.items, 'next_cursor': page.next_cursor})
+
+@reporting_view
+@login_required
+def export_records(request, kind):
+    """Download inpatient or outpatient records as CSV (or Parquet with ?format=parquet).
+
+    ``start``/``end`` (YYYY-MM-DD) limit the admission or visit dates. The CSV
+    is streamed row by row, so the response never sits in memory whole.
+    """
+    if kind not in exports.EXPORTS or accounts.staff_profile(request.user) is None:
+        return JsonResponse({'error': 'not found'}, status=404)
+    bounds = {}
+    for name in ('start', 'end'):
+        value = request.GET.get(name)
+        try:
+            bounds[name] = parse_date(value) if value else None
+        except ValueError:
+            bounds[name] = None
+        if value and bounds[name] is None:
+            return JsonResponse({'error': f'{name} must be a YYYY-MM-DD date'}, status=400)
+    start, end = bounds['start'], bounds['end']
+    filename = f"{kind}-{start or 'all'}-{end or 'all'}"
+
+    if request.GET.get('format') == 'parquet':
+        if not exports.parquet_available():
+            return JsonResponse({'error': 'Parquet export is not available on this server'}, status=400)
+        # Parquet needs its footer written last, so it is spooled to disk
+        # rather than memory and streamed from there.
+        spool = tempfile.TemporaryFile()
+        exports.write_parquet(kind, spool, start, end)
+        spool.seek(0)
+        response = FileResponse(spool, as_attachment=True, filename=f'{filename}.parquet')
+        if isinstance(request, ASGIRequest):
+            blocks = iter(lambda: spool.read(response.block_size), b'')
+            response.streaming_content = exports.aiterate(blocks, batch_size=1)
+        return response
+
+    lines = exports.csv_lines(kind, start, end)
+    if isinstance(request, ASGIRequest):
+        lines = exports.aiterate(lines)
+    response = StreamingHttpResponse(lines, content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+@login_required
+def search_records(request):
+    """Ranked free-text search over clinical notes and appointment symptoms."""
+    staff = accounts.staff_profile(request.user)
+    if staff is None:
+        raise Http404
+    query = request.GET.get('q', '').strip()
+    kinds = [kind for kind in request.GET.getlist('kind') if kind in search.LABELS]
+    try:
+        page_number = int(request.GET.get('page', 1))
+    except ValueError:
+        page_number = 1
+    page = search.search(query, kinds, page_number)
+
+    params = request.GET.copy()
+    params['page'] = page.page + 1
+    next_url = '?' + params.urlencode() if page.has_next else None
+    params['page'] = page.page - 1
+    previous_url = '?' + params.urlencode() if page.page > 1 else None
+    return render(request, 'search_results.html', {
+        'staff': staff,
+        'query': query,
+        'kinds': kinds,
+        'page': page,
+        'next_url': next_url,
+        'previous_url': previous_url,
+    })
+
+@login_required
+def patient_lookup(request):
+    """Typeahead: patients matching ``?q=`` by name, mobile, Aadhaar or admission number."""
+    if accounts.staff_profile(request.user) is None:
+        return JsonResponse({'error': 'not found'}, status=404)
+    try:
+        limit = int(request.GET.get('limit', lookup.DEFAULT_LIMIT))
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer'}, status=400)
+    return JsonResponse({'results': lookup.lookup(request.GET.get('q', ''), limit)})
+
 def add_patient_record(request):
     admission_number = request.GET.get('admission_number')
     patient = None
@@ -229,20 +355,23 @@ def add_patient_record(request):
             patient = None
 
     return render(request, 'add_patient_record.html', {'patient': patient})   
+
+def _staff_profile_state(request):
+    profile = accounts.staff_profile(request.user)
+    return profile and [getattr(profile, field.attname) for field in profile._meta.concrete_fields]
+
 @login_required
+@versions.conditional(vary=_staff_profile_state)
 def staff_home(request):
-    staff = StaffProfile.objects.get(user=request.user)
-    inpatients = InpatientRecord.objects.all()
-    outpatients = OutpatientRecord.objects.all()
+    staff = request.user.staffprofile
+    # The record listings live on the paginated patient_records page.
     return render(request, 'staff_home.html', {
         'staff': staff,
-        'inpatients': inpatients,
-        'outpatients': outpatients
     })
 
 @login_required
 def add_inpatient(request, patient_id):
-    staff = StaffProfile.objects.get(user=request.user)
+    staff = request.user.staffprofile
     patient = get_object_or_404(PatientProfile, id=patient_id)
 
     if request.method == 'POST':
@@ -251,7 +380,7 @@ def add_inpatient(request, patient_id):
             record = form.save(commit=False)
             record.patient = patient
             record.created_by = staff
-            record.save()
+            writer.run(record.save)
             return redirect('patient_records')
     else:
         form = InpatientForm()
@@ -260,7 +389,7 @@ def add_inpatient(request, patient_id):
 
 @login_required
 def add_outpatient(request, patient_id):
-    staff = StaffProfile.objects.get(user=request.user)
+    staff = request.user.staffprofile
     patient = get_object_or_404(PatientProfile, id=patient_id)
 
     if request.method == 'POST':
@@ -269,7 +398,7 @@ def add_outpatient(request, patient_id):
             record = form.save(commit=False)
             record.patient = patient
             record.created_by = staff
-            record.save()
+            writer.run(record.save)
             return redirect('patient_records')
     else:
         form = OutpatientForm()
@@ -284,14 +413,14 @@ def edit_outpatient(request, id):
     if request.method == 'POST':
         form = OutpatientForm(request.POST, instance=outpatient)
         if form.is_valid():
-            form.save()
+            writer.run(form.save)
             return redirect('patient_records')  # or wherever you want to redirect
     return render(request, 'edit_outpatient.html', {'form': form, 'outpatient': outpatient})
 # For deleting outpatient record
 @login_required
 def delete_outpatient(request, id):
     outpatient = get_object_or_404(OutpatientRecord, id=id)
-    outpatient.delete()
+    writer.run(outpatient.delete)
     return redirect('patient_records')
 
 
@@ -303,7 +432,7 @@ def edit_inpatient(request, id):
     if request.method == 'POST':
         form = InpatientForm(request.POST, instance=inpatient)
         if form.is_valid():
-            form.save()
+            writer.run(form.save)
             return redirect('patient_records')
     return render(request, 'edit_inpatient.html', {'form': form, 'inpatient': inpatient})
 
@@ -312,12 +441,41 @@ def edit_inpatient(request, id):
 @login_required
 def delete_inpatient(request, id):
     inpatient = get_object_or_404(InpatientRecord, id=id)
-    inpatient.delete()
+    writer.run(inpatient.delete)
     return redirect('patient_records')
 @login_required
+@require_POST
+def set_appointment_status(request, id, status):
+    if accounts.staff_profile(request.user) is None and request.user.role != 'admin':
+        return HttpResponseForbidden()
+    appointment = get_object_or_404(Appointment.objects.select_related('patient'), id=id)
+    appointment.status = status
+    writer.run(appointment.save, update_fields=['status'])
+    return redirect('today_appointments')
+
+async def queue_stream(request):
+    """Server-sent events for today's queue; needs the ASGI application."""
+    user = await request.auser()
+    if not user.is_authenticated or user.role not in ('staff', 'admin'):
+        return HttpResponseForbidden()
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse('Live updates need the ASGI server (hospital_system.asgi).', status=501)
+    stream = queue_events.event_stream(queue_events.channel_for(timezone.localdate()))
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def _start_of_today(request):
+    return timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+# Polled by the queue displays: the page changes with today's appointments,
+# their patients, and at midnight.
+@login_required
+@versions.conditional('appointments', 'patients', vary=lambda request: date.today(), since=_start_of_today)
 def today_appointments(request):
     today = date.today()
-    appointments = Appointment.objects.filter(appointment_date=today).order_by('token_number')
+    appointments = Appointment.objects.filter(appointment_date=today).select_related('patient').order_by('token_number')
 
     return render(request, 'today_appointments.html', {
         'appointments': appointments,
@@ -325,49 +483,28 @@ def today_appointments(request):
     })
 
 def get_inpatient_bed_prediction():
-    today = date.today()
-
-    # Count new admissions per day
-    last_14_days = InpatientRecord.objects.filter(admitted_date__gte=today - timedelta(days=14))
-    daily_counts = last_14_days.values('admitted_date').annotate(count=Count('id')).order_by('admitted_date')
-
-    # Calculate moving average
-    count_list = [entry['count'] for entry in daily_counts]
-    if count_list:
-        predicted_inpatients = sum(count_list) // len(count_list)
-    else:
-        predicted_inpatients = 2  # default/fallback
-
-    return predicted_inpatients
+    # Moving average of new admissions per day over the last 14 days
+    return census.moving_average('admissions', days=14, default=2)
 
 def get_outpatient_prediction():
-    today = date.today()
-
-    last_14_days = OutpatientRecord.objects.filter(visit_date__gte=today - timedelta(days=14))
-    daily_counts = last_14_days.values('visit_date').annotate(count=Count('id')).order_by('visit_date')
-
-    count_list = [entry['count'] for entry in daily_counts]
-    if count_list:
-        predicted_outpatients = sum(count_list) // len(count_list)
-    else:
-        predicted_outpatients = 5  # fallback
-
-    return predicted_outpatients
+    return census.moving_average('outpatient_visits', days=14, default=5)
 
+@reporting_view
 @login_required
 def admin_dashboard(request):
-    total_patients = PatientProfile.objects.count()
-    total_inpatients = InpatientRecord.objects.count()
-    total_outpatients = OutpatientRecord.objects.count()
-    total_staff = StaffProfile.objects.count()
-    total_doctors = StaffProfile.objects.filter(role='doctor').count()
+    stats = dashboard.get_dashboard_stats()
+    total_patients = stats['total_patients']
+    total_inpatients = stats['total_inpatients']
+    total_outpatients = stats['total_outpatients']
+    total_staff = stats['total_staff']
+    total_doctors = stats['total_doctors']
     
-    total_beds = 50  # Example total beds
-    occupied_beds = total_inpatients
-    available_beds = total_beds - occupied_beds
+    total_beds = stats['beds']['total']
+    occupied_beds = stats['beds']['occupied']
+    available_beds = stats['beds']['free']
     
-    predicted_inpatients = train_predict_model('D:/niral/HMS\hospital_system/core/data/Book1.csv')
-    predicted_outpatients = train_predict_model('D:/niral/HMS\hospital_system/core/data/Book2.csv')
+    predicted_inpatients = census.forecast('admissions', INPATIENT_CSV)
+    predicted_outpatients = census.forecast('outpatient_visits', OUTPATIENT_CSV)
 
     extra_beds_needed = max(0, predicted_inpatients - available_beds)
     bed_status_message = (
@@ -394,6 +531,32 @@ def admin_dashboard(request):
     return render(request, 'admin_dashboard.html', context)
 
 
+@reporting_view
+@user_passes_test(is_admin)
+def dashboard_stats(request):
+    """Dashboard counters as JSON, for consoles that poll."""
+    return JsonResponse(dashboard.get_dashboard_stats())
+
+
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+
+
+def metrics_endpoint(request):
+    """Request metrics in the Prometheus text format, for local scrapers and admins."""
+    if request.META.get('REMOTE_ADDR') not in LOCAL_ADDRESSES and not is_admin(request.user):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.prometheus_text(), content_type='text/plain; version=0.0.4')
+
+
+@user_passes_test(is_admin)
+def metrics_panel(request):
+    return render(request, 'metrics_panel.html', {
+        'views': metrics.summary(),
+        'profiles': list(metrics.profiles),
+        'sample_rate': getattr(settings, 'HMS_PROFILE_SAMPLE_RATE', 0),
+    })
+
+
 def user_logout(request):
     logout(request)
     return redirect('home')
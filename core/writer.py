@@ -0,0 +1,116 @@
+"""Single-writer queue for the hot write paths.
+
+SQLite allows one writer at a time. When bookings, registrations and record
+saves arrive together, every connection contends for the write lock, waits
+on the busy timeout, and pays for its own commit. With ``HMS_SERIALIZE_WRITES``
+those writes are instead handed to one writer thread. It drains whatever has
+queued up and commits it as one transaction (group commit), giving each
+write its own savepoint so one failure does not undo the others. Readers are
+unaffected, and under WAL they never wait for the writer.
+
+When serialization is off, or the caller is already inside a transaction,
+:func:`run` calls the function directly inside ``transaction.atomic``.
+"""
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+# Most writes folded into one commit.
+MAX_BATCH = 64
+
+
+class SingleWriter:
+    def __init__(self, using=DEFAULT_DB_ALIAS, max_batch=MAX_BATCH):
+        self.using = using
+        self.max_batch = max_batch
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def in_writer_thread(self):
+        return threading.current_thread() is self._thread
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue ``fn(*args, **kwargs)`` and return a Future for its result."""
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=f'db-writer-{self.using}', daemon=True)
+                    self._thread.start()
+        future = Future()
+        self._queue.put((future, fn, args, kwargs))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._commit([job for job in batch if job[0].set_running_or_notify_cancel()])
+
+    def _commit(self, batch):
+        connections[self.using].close_if_unusable_or_obsolete()
+        outcomes = []
+        committed = []
+        try:
+            with transaction.atomic(using=self.using):
+                # The first commit hook, so it runs only once the batch is written.
+                transaction.on_commit(lambda: committed.append(True), using=self.using)
+                for future, fn, args, kwargs in batch:
+                    try:
+                        with transaction.atomic(using=self.using):
+                            outcomes.append((fn(*args, **kwargs), None))
+                    except Exception as exc:
+                        outcomes.append((None, exc))
+        except Exception as exc:
+            if committed:
+                # The batch was written, a later on_commit hook failed.
+                logger.exception('An on_commit hook failed after a write batch was committed')
+            else:
+                # The commit itself failed, so nothing in the batch was written.
+                for future, *_ in batch:
+                    future.set_exception(exc)
+                return
+        for (future, *_), (result, exc) in zip(batch, outcomes):
+            if exc is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exc)
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(using=DEFAULT_DB_ALIAS):
+    if using not in _writers:
+        with _writers_lock:
+            _writers.setdefault(using, SingleWriter(using))
+    return _writers[using]
+
+
+def enabled():
+    return getattr(settings, 'HMS_SERIALIZE_WRITES', False)
+
+
+def run(fn, *args, using=DEFAULT_DB_ALIAS, **kwargs):
+    """Run ``fn(*args, **kwargs)`` as one atomic write and return its result.
+
+    ``fn`` should only write to the database. Expensive work such as password
+    hashing belongs before the call, so it does not hold up the queue.
+    Exceptions raised by ``fn`` are re-raised here.
+    """
+    writer = get_writer(using)
+    if not enabled() or writer.in_writer_thread() or connections[using].in_atomic_block:
+        with transaction.atomic(using=using):
+            return fn(*args, **kwargs)
+    return writer.submit(fn, *args, **kwargs).result()
@@ -0,0 +1,143 @@
+"""Read-replica routing for reporting views.
+
+Views decorated with :func:`reporting_view` read from the ``replica``
+database alias when one is configured. Everything else, and every write,
+uses ``default``. The replica can be any second database; with SQLite it is
+usually a snapshot kept fresh by ``manage.py snapshot_replica``.
+
+A replica lags behind the primary. After a client makes a write request,
+its reporting views read from the primary for ``HMS_REPLICA_STICKY_SECONDS``,
+so people see their own changes straight away.
+"""
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_ALIAS = 'replica'
+STICKY_COOKIE = 'hms_primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in connections.settings
+
+
+def reporting_view(view):
+    """Mark a view as read-only reporting that may be served from the replica."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        return view(*args, **kwargs)
+
+    wrapper.use_replica = True
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and replica_configured():
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # The replica gets its schema from the primary.
+        return db != REPLICA_ALIAS
+
+
+def _replica_reads(content):
+    # Streaming responses are read after the middleware has returned.
+    _use_replica.set(True)
+    try:
+        yield from content
+    finally:
+        _use_replica.set(False)
+
+
+async def _areplica_reads(content):
+    _use_replica.set(True)
+    try:
+        async for chunk in content:
+            yield chunk
+    finally:
+        _use_replica.set(False)
+
+
+class ReplicaRoutingMiddleware:
+    """Route reporting views to the replica, except just after a client's writes."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # Django runs a sync process_view in a thread under ASGI.
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        request.use_replica = False
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_replica.set(False)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        request.use_replica = False
+        try:
+            response = await self.get_response(request)
+        finally:
+            _use_replica.set(False)
+        return self.finish(request, response)
+
+    def finish(self, request, response):
+        if request.use_replica and response.streaming:
+            reads = _areplica_reads if response.is_async else _replica_reads
+            response.streaming_content = reads(response.streaming_content)
+        if request.method not in SAFE_METHODS and replica_configured():
+            window = getattr(settings, 'HMS_REPLICA_STICKY_SECONDS', 30)
+            response.set_cookie(STICKY_COOKIE, str(int(time.time() + window)), max_age=window,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.routes_to_replica(request, view_func):
+            # Load the session and user from the primary first: a snapshot may
+            # predate the login, and would then look like a logged-out client.
+            if hasattr(request, 'user'):
+                request.user.is_authenticated
+            request.use_replica = True
+            _use_replica.set(True)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        if self.routes_to_replica(request, view_func):
+            if hasattr(request, 'user'):
+                await sync_to_async(lambda: request.user.is_authenticated)()
+            request.use_replica = True
+            _use_replica.set(True)
+
+    def routes_to_replica(self, request, view_func):
+        return (getattr(view_func, 'use_replica', False) and request.method in SAFE_METHODS
+                and replica_configured() and not self.sticky(request))
+
+    def sticky(self, request):
+        try:
+            return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
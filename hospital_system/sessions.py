@@ -0,0 +1,34 @@
+"""Session storage modes for ``SESSION_ENGINE``.
+
+``db``
+    Django's default. Every logged-in request reads the session table and
+    every login writes to it, competing with other writes for SQLite's lock.
+``cache``
+    Sessions live only in the ``sessions`` cache. Nothing touches the
+    database, but sessions are gone when the cache is cleared. With the
+    default in-process cache that means a restart, and workers do not share
+    sessions. Point the ``sessions`` cache at a shared server (Redis,
+    memcached) to use this with several workers.
+``cached_db``
+    The cache in front of the table. Writes go to both, and reads only hit
+    the database when the cache misses.
+``signed_cookies``
+    The session is the cookie, signed with ``SECRET_KEY``. No server-side
+    storage at all, but it cannot be revoked before it expires. Logging out
+    only clears the cookie in that browser.
+"""
+from django.core.exceptions import ImproperlyConfigured
+
+ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+
+def session_engine(mode):
+    """The ``SESSION_ENGINE`` for ``mode``."""
+    if mode not in ENGINES:
+        raise ImproperlyConfigured(f"HMS_SESSION_MODE must be one of {', '.join(ENGINES)}, not {mode!r}")
+    return ENGINES[mode]
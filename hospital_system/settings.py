@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from .sessions import session_engine
+from .sqlite import database_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -41,13 +45,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.accounts.ProfileAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'hospital_system.routers.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'hospital_system.urls'
@@ -56,13 +62,21 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Compile each template once per process, even with DEBUG on.
+            # Edited templates then need a restart (runserver's autoreloader
+            # clears it for you).
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
@@ -73,13 +87,118 @@ WSGI_APPLICATION = 'hospital_system.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# 'production' enables WAL, tuned pragmas, IMMEDIATE transactions and
+# persistent connections; see hospital_system/sqlite.py.
+HMS_SQLITE_PROFILE = os.environ.get('HMS_SQLITE_PROFILE', 'default')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Tests run against an on-disk database so concurrency tests see real
+        # SQLite file locking; the default shared-cache in-memory test database
+        # fails lock conflicts immediately instead of waiting for the lock.
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+        **database_settings(
+            HMS_SQLITE_PROFILE,
+            timeout=int(os.environ.get('HMS_SQLITE_TIMEOUT', 20)),
+            conn_max_age=int(os.environ.get('HMS_CONN_MAX_AGE', 600)),
+        ),
+    }
+}
+
+# Optional read replica for reporting views (hospital_system/routers.py). With
+# SQLite this is a snapshot refreshed by `manage.py snapshot_replica`; any
+# second database can be configured as 'replica' instead.
+HMS_REPLICA_PATH = os.environ.get('HMS_REPLICA_PATH')
+if HMS_REPLICA_PATH:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{HMS_REPLICA_PATH}?mode=ro',
+        'OPTIONS': {'timeout': int(os.environ.get('HMS_SQLITE_TIMEOUT', 20))},
+        # Reconnect per request so each new snapshot is picked up.
+        'CONN_MAX_AGE': 0,
+        'TEST': {'MIRROR': 'default'},
     }
+
+DATABASE_ROUTERS = ['hospital_system.routers.ReplicaRouter']
+
+# After a write, the client's reporting views read the primary for this long.
+HMS_REPLICA_STICKY_SECONDS = int(os.environ.get('HMS_REPLICA_STICKY_SECONDS', 30))
+
+# Run the hot write paths through one writer thread (core/writer.py).
+HMS_SERIALIZE_WRITES = os.environ.get(
+    'HMS_SERIALIZE_WRITES', '1' if HMS_SQLITE_PROFILE == 'production' else '0'
+) == '1'
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Kept apart so clearing other caches does not log everyone out.
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
 }
 
+# Cache alias and lifetime (seconds) of the admin dashboard counters
+HMS_DASHBOARD_CACHE = 'default'
+HMS_DASHBOARD_CACHE_TTL = 30
+
+# Cache alias and lifetime (seconds) of logged-in users with their profiles.
+# Changes are only dropped from the cache of the worker that made them, so
+# with several workers this alias must be a shared cache (check --deploy warns).
+HMS_USER_CACHE = 'default'
+HMS_USER_CACHE_TTL = 300
+
+# Cache alias holding the patient lookup generation (core/lookup.py). It must
+# be shared between workers for their LRUs to see each other's changes.
+HMS_LOOKUP_CACHE = 'default'
+
+# Cache alias and lifetime (seconds) of rendered listing fragments and the
+# search document total. They are keyed by table change counters
+# (core/versions.py), so the TTL only bounds how long superseded entries
+# occupy the cache.
+HMS_FRAGMENT_CACHE = 'default'
+HMS_FRAGMENT_CACHE_TTL = 600
+
+
+# Sessions: 'db', 'cache', 'cached_db' or 'signed_cookies' (hospital_system/sessions.py)
+HMS_SESSION_MODE = os.environ.get('HMS_SESSION_MODE', 'db')
+SESSION_ENGINE = session_engine(HMS_SESSION_MODE)
+SESSION_CACHE_ALIAS = 'sessions'
+
+
+# Password hashing (core/passwords.py)
+# The preferred hasher is listed first; hashes made with the others still
+# verify and are upgraded at the owner's next login. 'argon2' needs argon2-cffi.
+HMS_PASSWORD_HASHER = os.environ.get('HMS_PASSWORD_HASHER', 'pbkdf2')
+HMS_PASSWORD_HASHERS = {
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'core.passwords.TunedScryptPasswordHasher',
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+}
+PASSWORD_HASHERS = [HMS_PASSWORD_HASHERS[HMS_PASSWORD_HASHER]] + [
+    hasher for name, hasher in HMS_PASSWORD_HASHERS.items() if name != HMS_PASSWORD_HASHER
+] + [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+# Scrypt cost: N (a power of two), r and p
+HMS_SCRYPT_WORK_FACTOR = int(os.environ.get('HMS_SCRYPT_WORK_FACTOR', 2 ** 14))
+HMS_SCRYPT_BLOCK_SIZE = 8
+HMS_SCRYPT_PARALLELISM = 1
+
+# Threads hashing passwords for the async login and registration views (None: one per CPU)
+HMS_HASHER_WORKERS = None
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -125,3 +244,24 @@ AUTH_USER_MODEL = 'core.User'
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'redirect_dashboard'
 LOGOUT_REDIRECT_URL = 'login'
+
+# Token numbers 1..N of each day are reserved for priority patients
+HMS_PRIORITY_TOKEN_SLOTS = 10
+
+# Bed count shown on the admin dashboard until wards and beds are configured
+HMS_TOTAL_BEDS = 50
+
+# Pub/sub broker for live queue events; falls back to the in-process broker
+HMS_QUEUE_BROKER = 'core.queue_events.LocalBroker'
+
+# Full-text search backend: 'auto' (FTS5 when available), 'fts5' or 'postings'
+HMS_SEARCH_BACKEND = 'auto'
+
+# Per-view request metrics (core/metrics.py), served at /metrics/
+HMS_METRICS_ENABLED = True
+# Requests running one statement this many times are flagged as N+1
+HMS_DUPLICATE_QUERY_THRESHOLD = 3
+# Share of requests to profile (0 disables), with 'cprofile' or 'pyinstrument'
+HMS_PROFILE_SAMPLE_RATE = float(os.environ.get('HMS_PROFILE_SAMPLE_RATE', 0))
+HMS_PROFILER = os.environ.get('HMS_PROFILER', 'cprofile')
+HMS_PROFILE_KEEP = 20
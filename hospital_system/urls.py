@@ -20,5 +20,6 @@ from core import views
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('dashboard/stats/', views.dashboard_stats, name='dashboard_stats'),
     path('', include('core.urls')),
 ]